@@ -0,0 +1,351 @@
+"""Prestandamätning av create_dashboard.py mot en lokal ersättare för g0v.se
+
+Startar en HTTP-server med syntetiska codes.json och dokumentflöden i valfri
+storlek och fördröjning, kör byggets steg var för sig i en tom katalog och
+sparar tiderna i BENCHMARK_FILE (en JSON-rad per storlek och körning) så att
+försämringar syns mellan versioner. Samma server svarar som regeringen.se
+med syntetiska dokumentsidor för crawlern.
+
+    python benchmark.py --sizes 10000 100000 1000000 --latency 0.1
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import closing, redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bygget ska använda benchmarkens egen katalog, inte en delad cache
+os.environ.pop('G0V_CACHE_DIR', None)
+import create_dashboard as dashboard
+
+BENCHMARK_FILE = 'benchmark_results.jsonl'
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_LATENCY = 0.05
+DEFAULT_REPEAT = 20
+DEFAULT_CRAWL_LIMIT = 500
+
+DEPARTMENTS = [
+    'Arbetsmarknadsdepartementet', 'Finansdepartementet', 'Försvarsdepartementet',
+    'Infrastrukturdepartementet', 'Justitiedepartementet', 'Klimat- och näringslivsdepartementet',
+    'Kulturdepartementet', 'Landsbygds- och infrastrukturdepartementet', 'Socialdepartementet',
+    'Utbildningsdepartementet', 'Utrikesdepartementet', 'Statsrådsberedningen', 'Regeringen'
+]
+AGENCIES = ['Skatteverket', 'Naturvårdsverket', 'Polismyndigheten', 'Försäkringskassan', 'Trafikverket']
+CATEGORIES = [
+    'Arbetsmarknad', 'Barn och unga', 'Bostäder', 'Demokrati', 'Digitalisering', 'Energi',
+    'Europeiska unionen', 'Folkhälsa', 'Försvar', 'Hälso- och sjukvård', 'Integration',
+    'Jämställdhet', 'Klimat', 'Kultur', 'Landsbygd', 'Migration', 'Miljö', 'Näringsliv',
+    'Polis', 'Rättsväsendet', 'Skatter', 'Skola', 'Socialförsäkringar', 'Statsbudget',
+    'Transporter', 'Utbildning', 'Välfärd', 'Äldreomsorg', 'Återvinning', 'Öppen förvaltning'
+]
+WORDS = (
+    'en utredning om skatt skola vård miljö försvar bostäder klimat energi polis migration '
+    'åklagare äldreomsorg kommun region myndighet reform uppdrag översyn förslag lag '
+    'förordning finansiering digital säkerhet beredskap näringsliv forskning élite café'
+).split()
+ID_PREFIXES = ['Dir.', 'Ds', 'SOU', 'RU', 'Rapport']
+
+# Sökningar som mäts: (etikett, sökterm, filter till search_documents)
+QUERIES = [
+    ('ett ord', 'klimat', {}),
+    ('två ord', 'skatt reform', {}),
+    ('id', 'SOU 2020', {}),
+    ('ord + typ', 'miljö', {'doc_types': ['SOU']}),
+    ('departement', '', {'departments': ['Finans']}),
+    ('ord + kategori', 'vård', {'categories': ['Hälso- och sjukvård']}),
+    ('datumintervall', '', {'date_from': '2020-03', 'date_to': '2021-06'}),
+    ('ord + datum', 'klimat', {'date_from': '2022'}),
+    ('ingen träff', 'xyzzy', {}),
+    ('rankad', 'klimat reform', {'ranked': True})
+]
+
+def synthetic_codes():
+    """Syntetisk codes.json: departement, myndigheter och kategorier"""
+    names = DEPARTMENTS + AGENCIES + CATEGORIES
+    return {str(code): name for code, name in enumerate(names, 1)}
+
+def synthetic_feed(feed_index, count, rng):
+    """Ett syntetiskt dokumentflöde med count dokument, som JSON-bytes"""
+    senders = list(range(1, len(DEPARTMENTS) + len(AGENCIES) + 1))
+    categories = list(range(len(senders) + 1, len(senders) + len(CATEGORIES) + 1))
+    prefix = ID_PREFIXES[feed_index]
+
+    documents = []
+    for n in range(count):
+        year = rng.randint(2000, 2025)
+        words = rng.sample(WORDS, 6)
+        documents.append({
+            'id': f"{prefix} {year}:{n + 1}",
+            'title': f"{words[0].capitalize()} och {words[1]} – {' '.join(words[2:5])}",
+            'summary': None if n % 11 == 0 else ' '.join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))),
+            'published': None if n % 97 == 0 else f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'url': f"/{prefix.lower().rstrip('.')}/{year}/{n + 1}/",
+            'senders': rng.sample(senders, rng.randint(0, 2)),
+            'categories': rng.sample(categories, rng.randint(0, 3))
+        })
+    return json.dumps(documents, ensure_ascii=False).encode('utf-8')
+
+def synthetic_bodies(size, seed):
+    """Svarskroppar per sökväg för en korpus på size dokument fördelade på alla flöden"""
+    rng = random.Random(seed)
+    bodies = {dashboard.CODES_PATH: json.dumps(synthetic_codes(), ensure_ascii=False).encode('utf-8')}
+    per_feed, extra = divmod(size, len(dashboard.FEEDS))
+    for feed_index, (_, path) in enumerate(dashboard.FEEDS):
+        bodies[path] = synthetic_feed(feed_index, per_feed + (feed_index < extra), rng)
+    return bodies
+
+def synthetic_page(path):
+    """Syntetisk dokumentsida för path, samma innehåll varje gång"""
+    rng = random.Random(path)
+    paragraphs = ''.join(f"<p>{' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))}</p>"
+                         for _ in range(rng.randint(2, 8)))
+    return (f"<!DOCTYPE html><html><head><title>{path}</title><script>var x = 1;</script></head>"
+            f"<body><nav><a href='/'>Start</a> meny</nav><main><h1>{path}</h1>{paragraphs}</main>"
+            f"<footer>Regeringskansliet</footer></body></html>").encode('utf-8')
+
+class FakeG0vHandler(BaseHTTPRequestHandler):
+    """Svarar som g0v.se, med fördröjning och villkorliga GET via ETag"""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        path = self.path.split('?')[0]
+        body = self.server.bodies.get(path)
+        content_type = 'application/json; charset=utf-8'
+        # Okända sökvägar som ser ut som dokumentens url svarar som dokumentsidor på regeringen.se
+        if body is None and path.split('/')[1:2] in ([prefix.lower().rstrip('.')] for prefix in ID_PREFIXES):
+            body = synthetic_page(path)
+            content_type = 'text/html; charset=utf-8'
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeG0v(ThreadingHTTPServer):
+    """Lokal g0v.se på en ledig port; bodies byts ut mellan körningarna"""
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), FakeG0vHandler)
+        self.latency = latency
+        self.bodies = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+def timed(timings, stage, function, *args, **kwargs):
+    """Anropa function och spara tiden i sekunder under stage"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[stage] = round(time.perf_counter() - start, 4)
+    return result
+
+def output_sizes(manifest, assets):
+    """Storlek i bytes på det publicerade resultatet, okomprimerat och förkomprimerat"""
+    sizes = {'index.html': os.path.getsize(dashboard.OUTPUT_FILE), 'files': 0}
+    for suffix in ('', '.gz', '.br'):
+        sizes['bundle' + suffix] = 0
+    for directory in (dashboard.DATA_DIR, dashboard.ASSETS_DIR):
+        for file_name in os.listdir(directory):
+            suffix = os.path.splitext(file_name)[1]
+            key = 'bundle' + suffix if suffix in ('.gz', '.br') else 'bundle'
+            sizes[key] += os.path.getsize(os.path.join(directory, file_name))
+            sizes['files'] += key == 'bundle'
+
+    # Det sidan hämtar innan första resultatet visas
+    initial = sizes['index.html'] + sum(os.path.getsize(path) for path in assets.values())
+    loaded = 0
+    for shard in manifest['shards']:
+        if loaded >= manifest['initialDocuments']:
+            break
+        initial += os.path.getsize(shard['file'])
+        loaded += shard['count']
+    sizes['initial'] = initial
+    for export_format, path in manifest['exports'].items():
+        sizes['export.' + export_format + '.gz'] = os.path.getsize(path)
+    return sizes
+
+def search_latency(repeat):
+    """Svarstid i millisekunder för search_documents() per fråga i QUERIES"""
+    latency = {}
+    for label, search_term, filters in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hits = len(dashboard.search_documents(search_term, **filters))
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        latency[label] = {
+            'median': round(statistics.median(samples), 3),
+            'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            'hits': hits
+        }
+    return latency
+
+def run_benchmark(server, size, seed, repeat, crawl_limit):
+    """Mät ett bygge av size dokument från grunden; returnerar resultatet som dict"""
+    timings = {}
+    server.bodies = timed(timings, 'generate', synthetic_bodies, size, seed)
+
+    workdir = tempfile.mkdtemp(prefix='g0v-benchmark-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # Byggets steg ett i taget, som i create_complete_dashboard()
+        codes, feeds = timed(timings, 'fetch', dashboard.fetch_all)
+        with closing(dashboard.open_store()) as conn:
+            timed(timings, 'normalize', dashboard.sync_store, conn, codes, feeds)
+            code_table = dashboard.load_code_table(conn)
+            scan = timed(timings, 'extract', dashboard.scan_store, conn, code_table)
+        manifest = timed(timings, 'write_data', dashboard.write_client_data, scan, code_table)
+        manifest['exports'] = timed(timings, 'exports', dashboard.write_exports, scan, code_table)
+        assets = timed(timings, 'write_assets', dashboard.write_assets)
+        timed(timings, 'render', dashboard.write_dashboard, dashboard.OUTPUT_FILE, assets, scan, manifest)
+        build_state = dashboard._build_state(codes, feeds)
+        timed(timings, 'views', dashboard.write_views, scan, code_table, assets, build_state['script'])
+        # Utan sparat byggtillstånd skulle nästa bygge inte se att inget ändrats
+        dashboard._write_build_state(build_state)
+        sizes = output_sizes(manifest, assets)
+        del scan, manifest
+
+        # Dagliga körningar: oförändrade flöden och ett tvingat ombygge
+        timed(timings, 'refetch', dashboard.fetch_all)
+        with redirect_stdout(io.StringIO()):
+            if timed(timings, 'build_unchanged', dashboard.create_complete_dashboard):
+                raise RuntimeError("bygget med oförändrade flöden byggde om dashboarden")
+            timed(timings, 'build_forced', dashboard.create_complete_dashboard, True)
+
+        # Crawlning av crawl_limit dokumentsidor, sedan samma sidor igen med villkorliga anrop
+        with closing(dashboard.open_store()) as conn:
+            timed(timings, 'crawl', dashboard.crawl_pages, conn, limit=crawl_limit)
+            timed(timings, 'recrawl', dashboard.crawl_pages, conn, recrawl=True, limit=crawl_limit)
+
+        # Första sökningen skriver ögonblicksbilden respektive fulltextindexet;
+        # en ny process motsvaras av att den mappade ögonblicksbilden släpps
+        timed(timings, 'snapshot', dashboard.search_documents, 'klimat')
+        dashboard._snapshot = None
+        timed(timings, 'warm_start', dashboard.search_documents, 'klimat')
+        timed(timings, 'fulltext_index', dashboard.search_documents, 'klimat', ranked=True)
+        search = search_latency(repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'seconds': timings,
+        'search_ms': search,
+        'bytes': sizes
+    }
+
+def git_revision():
+    """Aktuell git-revision för create_dashboard.py, None utanför ett git-repo"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', 'create_dashboard.py'], capture_output=True,
+                               text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        return revision + ('+' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_results(path):
+    """Tidigare sparade resultat, äldst först"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_result(result, previous):
+    """Skriv ut ett resultat, med ändringen mot förra körningen med samma storlek och fördröjning"""
+    print(f"\n{result['documents']} dokument, {result['latency'] * 1000:.0f} ms fördröjning "
+          f"(revision {result['revision']})")
+
+    def compare(value, old):
+        if not old:
+            return ''
+        return f"  ({(value - old) / old * 100:+.1f} %)"
+
+    for stage, seconds in result['seconds'].items():
+        old = previous and previous['seconds'].get(stage)
+        print(f"  {stage:<16} {seconds:>9.3f} s{compare(seconds, old)}")
+    for label, latency in result['search_ms'].items():
+        old = previous and previous['search_ms'].get(label, {}).get('median')
+        print(f"  sök: {label:<14}{latency['median']:>8.2f} ms (p95 {latency['p95']:.2f} ms, "
+              f"{latency['hits']} träffar){compare(latency['median'], old)}")
+    for name, size in result['bytes'].items():
+        old = previous and previous['bytes'].get(name)
+        unit = 'filer' if name == 'files' else 'bytes'
+        print(f"  {name:<16} {size:>11} {unit}{compare(size, old)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mät create_dashboard.py mot en lokal syntetisk g0v.se")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="antal dokument per körning, t.ex. 10000 100000 1000000")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help="serverns fördröjning per svar i sekunder")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="antal mätningar per sökfråga")
+    parser.add_argument('--seed', type=int, default=1, help="slumpfrö för den syntetiska datan")
+    parser.add_argument('--crawl-limit', type=int, default=DEFAULT_CRAWL_LIMIT,
+                        help="antal dokumentsidor som crawlas per körning")
+    parser.add_argument('--output', default=BENCHMARK_FILE, help="fil som resultaten läggs till i")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    history = load_results(output)
+
+    server = FakeG0v(args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    dashboard.G0V_BASE_URL = server.url
+    dashboard.REGERINGEN_BASE_URL = server.url
+    try:
+        for size in args.sizes:
+            result = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'documents': size,
+                'latency': args.latency,
+                'seed': args.seed
+            }
+            result['crawl_limit'] = args.crawl_limit
+            result.update(run_benchmark(server, size, args.seed, args.repeat, args.crawl_limit))
+
+            previous = [old for old in history
+                        if (old['documents'], old['latency'], old.get('seed')) == (size, args.latency, args.seed)]
+            print_result(result, previous[-1] if previous else None)
+
+            with open(output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"\nResultaten sparades i {output}")
@@ -1,128 +1,1500 @@
+import argparse
+import asyncio
+import base64
+import cProfile
+import gzip
+import hashlib
 import json
+import math
+import mmap
+import os
+import platform
+import random
+import re
 import requests
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from collections import defaultdict
+from html.parser import HTMLParser
+from http import HTTPStatus
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from contextlib import closing, contextmanager
+from itertools import accumulate, count, islice, repeat
+from operator import attrgetter
+from requests.adapters import HTTPAdapter
+from urllib.parse import parse_qs, unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Lägg till 2 timmar för Stockholm sommartid
 stockholm_time = datetime.now() + timedelta(hours=2)
 
-def create_complete_dashboard():
-    """Skapa en interaktiv HTML-dashboard för alla regeringsdokument"""
+# Bas-URL för g0v.se (kan pekas om, t.ex. mot en lokal testserver)
+G0V_BASE_URL = os.environ.get('G0V_BASE_URL', 'https://g0v.se')
+CODES_PATH = '/api/codes.json'
+
+# Alla dokumentflöden: (dokumenttyp, sökväg)
+FEEDS = [
+    ('Kommittédirektiv', '/rattsliga-dokument/kommittedirektiv.json'),
+    ('Ds/PM', '/rattsliga-dokument/departementsserien-och-promemorior.json'),
+    ('SOU', '/rattsliga-dokument/statens-offentliga-utredningar.json'),
+    ('Regeringsuppdrag', '/regeringsuppdrag.json'),
+    ('Rapport', '/rapporter.json')
+]
+DOCUMENT_TYPES = [doc_type for doc_type, _ in FEEDS]
+
+# Dokumentsidorna bakom doc.url för fulltextsökningen (kan pekas om, t.ex.
+# mot en lokal testserver). Crawlern har högst CRAWL_WORKERS anrop igång.
+REGERINGEN_BASE_URL = os.environ.get('G0V_REGERINGEN_URL', 'https://www.regeringen.se')
+CRAWL_WORKERS = 8
+
+# Timeout per anrop i sekunder: (anslutning, läsning)
+REQUEST_TIMEOUT = (10, 120)
+
+# Hela hämtningen ska vara klar inom FETCH_DEADLINE sekunder. Misslyckade
+# anrop görs om upp till FETCH_ATTEMPTS gånger med slumpad exponentiell
+# väntan; därefter används senast lyckade kopia i cachen.
+FETCH_DEADLINE = float(os.environ.get('G0V_FETCH_DEADLINE', 300))
+FETCH_ATTEMPTS = 4
+RETRY_BACKOFF = 1.0
+CHUNK_SIZE = 64 * 1024
+
+# Lokal cache för g0v.se-svar (ETag/Last-Modified) och status för senaste bygget
+CACHE_DIR = os.environ.get('G0V_CACHE_DIR', '.cache')
+BUILD_STATE_FILE = os.path.join(CACHE_DIR, 'build.json')
+DB_FILE = os.path.join(CACHE_DIR, 'dokument.db')
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, 'corpus.snapshot')
+ALERTS_STATE_FILE = os.path.join(CACHE_DIR, 'alerts.json')
+PAGES_DIR = os.path.join(CACHE_DIR, 'pages')
+FULLTEXT_INDEX_FILE = os.path.join(CACHE_DIR, 'fulltext.index')
+OUTPUT_FILE = 'index.html'
+
+# Mätrapport för bygget och valfri cProfile-dump, bredvid index.html
+METRICS_FILE = 'metrics.json'
+PROFILE_FILE = 'build.prof'
+
+# Dokumentdata skrivs som separata filer per år bredvid index.html.
+# Sidan laddar de nyaste filerna tills minst INITIAL_DOCUMENTS finns,
+# äldre laddas vid behov.
+DATA_DIR = 'data'
+ASSETS_DIR = 'assets'
+SHARD_MAX_DOCUMENTS = 5000
+INITIAL_DOCUMENTS = 2000
+
+# Förfiltrerade vyer per departement, kategori och dokumenttyp: en sida
+# och egna datafiler per vy under VIEWS_DIR, byggda i VIEW_WORKERS processer
+VIEWS_DIR = 'vyer'
+VIEWS_STATE_FILE = os.path.join(CACHE_DIR, 'views.json')
+VIEW_WORKERS = os.cpu_count() or 1
+
+# Export av hela samlingen som gzippad CSV och JSONL under EXPORT_DIR. Stora
+# exporter skrivs, komprimeras och skickas i delar om EXPORT_CHUNK_LINES rader.
+# Filerna checkas inte in utan publiceras under EXPORT_URL (i arbetsflödet en
+# GitHub-release); utan G0V_EXPORT_URL länkar sidan till EXPORT_DIR.
+EXPORT_DIR = 'export'
+EXPORT_URL = os.environ.get('G0V_EXPORT_URL', EXPORT_DIR)
+EXPORT_NAME = 'regeringsdokument'
+EXPORT_CHUNK_LINES = 5000
+EXPORT_GZIP_LEVEL = 6
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8'
+}
+CSV_HEADER = 'Dokumenttyp;ID;Titel;Publicerad;Departement;Kategorier;URL'
+
+# Sidans sökindex: antal ord per postningsblock
+SEARCH_BLOCK_WORDS = 4096
+
+# Fast radhöjd (px) i sidans virtualiserade resultatlista
+ROW_HEIGHT = 150
+
+# Sökningar viker bort versaler och accenter, men å, ä och ö är egna
+# bokstäver på svenska och behålls (æ och ø räknas som ä och ö)
+SEARCH_FOLD = {
+    'à': 'a', 'á': 'a', 'â': 'a', 'ã': 'a', 'ç': 'c',
+    'è': 'e', 'é': 'e', 'ê': 'e', 'ë': 'e',
+    'ì': 'i', 'í': 'i', 'î': 'i', 'ï': 'i', 'ñ': 'n',
+    'ò': 'o', 'ó': 'o', 'ô': 'o', 'õ': 'o',
+    'ù': 'u', 'ú': 'u', 'û': 'u', 'ü': 'u', 'ý': 'y', 'ÿ': 'y',
+    'æ': 'ä', 'ø': 'ö'
+}
+
+# Hur gammalt lagret får vara innan search_documents() synkar mot g0v.se
+STORE_MAX_AGE = timedelta(hours=1)
+
+# Parametrar för BM25-rankningen i fulltextsökningen
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Frågeservern (create_dashboard.py serve): adress, antal frågeresultat som
+# hålls i minnet (0 = ingen cache) och sidstorlek för dokumentlistan.
+# Sätts G0V_QUERY_API vid bygget (t.ex. /api) frågar sidan servern i
+# stället för att ladda alla dokument själv.
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+QUERY_CACHE_SIZE = 256
+QUERY_PAGE_SIZE = 100
+QUERY_MAX_PAGE_SIZE = 1000
+QUERY_API = os.environ.get('G0V_QUERY_API')
+# Det enda serve skickar utöver API:t: sidan och katalogerna med byggda filer
+SERVED_DIRS = (DATA_DIR, ASSETS_DIR, VIEWS_DIR, EXPORT_DIR)
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.gz': 'application/gzip'
+}
+
+_WHITESPACE = re.compile(r'\s*')
+_WORD = re.compile(r'\w+')
+_STATIC_FILE = re.compile(r'^(.+\.[0-9a-f]{12}\.\w+)(\.gz|\.br)?$')
+_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+_SEARCH_FOLD_TABLE = str.maketrans(SEARCH_FOLD)
+_BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+# Ett cachat svar: fil på disk, innehållets hash och om servern svarade 304
+CachedResponse = namedtuple('CachedResponse', ['file', 'sha256', 'not_modified', 'seconds', 'bytes', 'fallback'])
+SyncStats = namedtuple('SyncStats', ['new', 'changed', 'removed', 'seconds'])
+CrawlStats = namedtuple('CrawlStats', ['fetched', 'not_modified', 'failed', 'seconds'])
+StoreScan = namedtuple('StoreScan', ['counts', 'departments', 'categories', 'cube', 'documents_by_year', 'used_codes'])
+# En förfiltrerad vy: filnamn utan ändelse, rubrik och vilken sorts urval det är
+View = namedtuple('View', ['name', 'title', 'kind'])
+# En sparad sökning med samma kriterier som search_documents()
+StandingQuery = namedtuple('StandingQuery', ['name', 'term', 'doc_types', 'departments', 'categories'],
+                           defaults=('', None, None, None))
+
+_session = None
+
+def get_session():
+    """Delad HTTP-session med keep-alive, en anslutning per parallellt anrop"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=len(FEEDS) + 1)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+def _cache_file(path):
+    """Cachefil för en g0v.se-sökväg, t.ex. /api/codes.json -> .cache/feeds/api_codes.json"""
+    return os.path.join(CACHE_DIR, 'feeds', path.strip('/').replace('/', '_'))
+
+def _retryable(error):
+    """Om ett misslyckat anrop är värt att göra om: nätverksfel, timeout, 429 och 5xx"""
+    if isinstance(error, requests.HTTPError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+def _download(path, body_file, meta, deadline):
+    """Ett villkorligt anrop; returnerar (meta, mottagna bytes), meta är None vid 304"""
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
     
-    # Hämta koder
-    codes_response = requests.get('https://g0v.se/api/codes.json')
-    all_codes = codes_response.json()
+    remaining = max(deadline - time.monotonic(), 0.1)
+    timeout = (min(REQUEST_TIMEOUT[0], remaining), min(REQUEST_TIMEOUT[1], remaining))
+    received = 0
+    with get_session().get(G0V_BASE_URL + path, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code == 304:
+            return None, 0
+        response.raise_for_status()
+        
+        os.makedirs(os.path.dirname(body_file), exist_ok=True)
+        digest = hashlib.sha256()
+        tmp_file = body_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"tidsgränsen för hämtningen passerades ({path})")
+                digest.update(chunk)
+                f.write(chunk)
+                received += len(chunk)
+        # En hämtning som fetch_all() redan gett upp får inte ersätta kopian
+        if time.monotonic() > deadline:
+            raise requests.Timeout(f"tidsgränsen för hämtningen passerades ({path})")
+        os.replace(tmp_file, body_file)
+        
+        return {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': digest.hexdigest()
+        }, received
+
+def _read_meta(body_file):
+    """Metadata för en cachad kopia, tom dict om kopian saknas"""
+    meta_file = body_file + '.meta'
+    if os.path.exists(body_file) and os.path.exists(meta_file):
+        with open(meta_file, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def _fallback(path, error, seconds):
+    """Senast hämtade kopia av path när hämtningen misslyckats; annars kastas error"""
+    body_file = _cache_file(path)
+    meta = _read_meta(body_file)
+    if not meta.get('sha256'):
+        raise error
+    print(f"Varning: kunde inte hämta {path} ({error}), använder senast hämtade kopia")
+    return CachedResponse(body_file, meta['sha256'], True, seconds, 0, True)
+
+def fetch_cached(path, deadline=None):
+    """Hämta ett g0v.se-svar till diskcachen med villkorlig GET (ETag/Last-Modified)"""
+    if deadline is None:
+        deadline = time.monotonic() + FETCH_DEADLINE
+    body_file = _cache_file(path)
+    meta = _read_meta(body_file)
     
-    # Hämta alla dokumenttyper
-    print("Hämtar dokument...")
+    # Nätverksfel, timeouts och serverfel görs om så länge deadline (time.monotonic())
+    # tillåter; lyckas det inte används senast hämtade kopia (fallback=True)
+    start = time.perf_counter()
+    for attempt in range(FETCH_ATTEMPTS):
+        try:
+            new_meta, received = _download(path, body_file, meta, deadline)
+            break
+        except requests.RequestException as e:
+            error = e
+        
+        # Full jitter: vänta slumpmässigt upp till RETRY_BACKOFF * 2^försök
+        delay = random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+        if not _retryable(error) or attempt + 1 == FETCH_ATTEMPTS or time.monotonic() + delay >= deadline:
+            return _fallback(path, error, time.perf_counter() - start)
+        time.sleep(delay)
     
-    # Kommittédirektiv
-    kd_response = requests.get('https://g0v.se/rattsliga-dokument/kommittedirektiv.json')
-    kd_lista = kd_response.json()
-    for doc in kd_lista:
-        doc['document_type'] = 'Kommittédirektiv'
-    print(f"- {len(kd_lista)} kommittédirektiv")
-    
-    # Ds och PM
-    ds_response = requests.get('https://g0v.se/rattsliga-dokument/departementsserien-och-promemorior.json')
-    ds_lista = ds_response.json()
-    for doc in ds_lista:
-        doc['document_type'] = 'Ds/PM'
-    print(f"- {len(ds_lista)} Ds/PM")
-    
-    # SOU
-    sou_response = requests.get('https://g0v.se/rattsliga-dokument/statens-offentliga-utredningar.json')
-    sou_lista = sou_response.json()
-    for doc in sou_lista:
-        doc['document_type'] = 'SOU'
-    print(f"- {len(sou_lista)} SOU")
-    
-    # Regeringsuppdrag
-    ru_response = requests.get('https://g0v.se/regeringsuppdrag.json')
-    ru_lista = ru_response.json()
-    for doc in ru_lista:
-        doc['document_type'] = 'Regeringsuppdrag'
-    print(f"- {len(ru_lista)} regeringsuppdrag")
-    
-    # Rapporter
-    rap_response = requests.get('https://g0v.se/rapporter.json')
-    rap_lista = rap_response.json()
-    for doc in rap_lista:
-        doc['document_type'] = 'Rapport'
-    print(f"- {len(rap_lista)} rapporter")
-    
-    # Kombinera alla dokument
-    alla_dokument = kd_lista + ds_lista + sou_lista + ru_lista + rap_lista
-    print(f"\nTotalt: {len(alla_dokument)} dokument")
-    
-    # Samla alla unika departement och kategorier
-    all_departments = set()
-    all_categories = set()
-    
-    # Lista över giltiga departement-suffix och specialfall
-    valid_department_endings = [
-        'departementet',
-        'Statsrådsberedningen',
-        'Regeringen',
-        'Regeringskansliet'
-    ]
-    
-    for doc in alla_dokument:
-        for sender in doc.get('senders', []):
-            dept_name = all_codes.get(str(sender), f"Okänt ({sender})")
-            
-            # Kontrollera om det är ett faktiskt departement
-            is_department = any(dept_name.endswith(ending) for ending in valid_department_endings)
-            
-            if is_department:
-                all_departments.add((str(sender), dept_name))
-        
-        for category in doc.get('categories', []):
-            cat_name = all_codes.get(str(category), f"Okänd ({category})")
-            all_categories.add((str(category), cat_name))
-    
-    sorted_departments = sorted(all_departments, key=lambda x: x[1])
-    sorted_categories = sorted(all_categories, key=lambda x: x[1])
-    
-    # Skapa HTML
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="sv">
-    <head>
-        <title>Regeringens dokument - Komplett Dashboard</title>
-        <meta charset="utf-8">
-        <style>
-            body {{
+    seconds = time.perf_counter() - start
+    if new_meta is None:
+        return CachedResponse(body_file, meta['sha256'], True, seconds, 0, False)
+    
+    with open(body_file + '.meta', 'w', encoding='utf-8') as f:
+        json.dump(new_meta, f)
+    
+    return CachedResponse(body_file, new_meta['sha256'], False, seconds, received, False)
+
+def fetch_all(doc_types=None, deadline=None):
+    """Hämta koder och dokumentflöden parallellt; (codes, {dokumenttyp: CachedResponse}) i FEEDS-ordning"""
+    if deadline is None:
+        deadline = time.monotonic() + FETCH_DEADLINE
+    feeds = [(CODES_PATH, CODES_PATH)] + [(doc_type, path) for doc_type, path in FEEDS
+                                          if not doc_types or doc_type in doc_types]
+    
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(feeds))
+    futures = [executor.submit(fetch_cached, path, deadline) for _, path in feeds]
+    wait(futures, timeout=max(deadline - time.monotonic(), 0))
+    # Vänta inte på anrop som passerat tidsgränsen; de avbryts vid nästa block
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    # Anrop som pågår vid deadline får sin senast hämtade kopia. Ett flöde som varken
+    # går att hämta eller finns i cachen utelämnas så att övriga ändå byggs; för
+    # koderna är det ett fel.
+    results = {}
+    for (source, path), future in zip(feeds, futures):
+        try:
+            if future.done():
+                results[source] = future.result()
+            else:
+                results[source] = _fallback(path, requests.Timeout("tidsgränsen för hämtningen passerades"),
+                                            time.perf_counter() - start)
+        except requests.RequestException as e:
+            if source == CODES_PATH:
+                raise
+            print(f"Varning: {source} hoppas över, kunde inte hämtas och saknas i cachen ({e})")
+    
+    codes = results.pop(CODES_PATH)
+    return codes, results
+
+def load_json(cached):
+    """Läs ett cachat JSON-svar"""
+    with open(cached.file, encoding='utf-8') as f:
+        return json.load(f)
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """Läs en JSON-array element för element ur en textfil"""
+    # Bara aktuellt element och ett läsfönster hålls i minnet, så
+    # minnesåtgången beror inte på hur stort flödet är
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    
+    def skip_whitespace():
+        nonlocal buf, pos, eof
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+    
+    skip_whitespace()
+    if buf[pos:pos + 1] != '[':
+        raise ValueError("Förväntade en JSON-array")
+    pos += 1
+    first = True
+    
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Oväntat slut på JSON-arrayen")
+        if buf[pos] == ']':
+            return
+        if not first:
+            if buf[pos] != ',':
+                raise ValueError(f"Förväntade ',' i JSON-arrayen, fick {buf[pos]!r}")
+            pos += 1
+            skip_whitespace()
+        
+        # Avkoda nästa element; fyll på fönstret tills elementet är komplett
+        while True:
+            try:
+                element, end = decoder.raw_decode(buf, pos)
+                # Ett tal kan fortsätta i nästa läsning ("1." + "5"), så ett värde
+                # som inte är objekt eller lista godtas först när en avgränsare följer
+                if eof or end < len(buf) and (isinstance(element, (dict, list)) or buf[end] in ' \t\n\r,]'):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more = f.read(max(chunk_size, len(buf) - pos))
+            buf, pos = buf[pos:] + more, 0
+            eof = not more
+        
+        yield element
+        pos = end
+        first = False
+
+def iter_feed(doc_type, cached):
+    """Strömma ett cachat dokumentflöde och märk dokumenten med dokumenttyp"""
+    with open(cached.file, encoding='utf-8') as f:
+        for doc in iter_json_array(f):
+            doc['document_type'] = doc_type
+            yield doc
+
+def _build_state(codes, feeds):
+    """Fingeravtryck för ett bygge: innehållet i alla svar plus själva skriptet"""
+    with open(__file__, 'rb') as f:
+        script_sha = hashlib.sha256(f.read()).hexdigest()
+    state = {'script': script_sha, 'api': QUERY_API, 'codes': codes.sha256}
+    for doc_type, cached in feeds.items():
+        state[doc_type] = cached.sha256
+    return state
+
+def _read_build_state():
+    try:
+        with open(BUILD_STATE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_build_state(state):
+    with open(BUILD_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+def open_store(path=None):
+    """Öppna det lokala dokumentlagret (SQLite), skapa tabellerna vid behov"""
+    path = path or DB_FILE
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS documents (
+            document_type TEXT NOT NULL,
+            id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            first_seen TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            PRIMARY KEY (document_type, id)
+        );
+        CREATE TABLE IF NOT EXISTS codes (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sources (
+            source TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            synced_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS documents_first_seen ON documents (first_seen);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            status INTEGER NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            text TEXT NOT NULL,
+            fetched_at TEXT NOT NULL
+        );
+    """)
+    return conn
+
+def _document_key(doc):
+    """Dokumentets nyckel i lagret: id, annars url, annars en hash av titel, datum och typ"""
+    key = doc.get('id') or doc.get('url')
+    if key:
+        return str(key)
+    # Utan hash skulle alla dokument utan id och url dela nyckeln '' och bara det första sparas
+    content = json.dumps([doc.get('title'), doc.get('published'), doc.get('document_type')], ensure_ascii=False)
+    return 'sha1:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def sync_store(conn, codes, feeds):
+    """Slå ihop hämtade svar med dokumentlagret; returnerar {källa: SyncStats} för de synkade flödena"""
+    now = datetime.now().isoformat(timespec='seconds')
+    known = dict(conn.execute('SELECT source, sha256 FROM sources'))
+    stats = {}
+    # Nya dokument får rowid efter alla som någonsin lagrats, även borttagna, så att
+    # rowid fungerar som vattenstämpel för vad som är nytt (SQLite återanvänder annars
+    # rowid när det senaste dokumentet tas bort)
+    stored_rowid = conn.execute("SELECT value FROM counters WHERE name = 'last_rowid'").fetchone()
+    rowids = count(max(conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM documents').fetchone()[0],
+                       stored_rowid[0] if stored_rowid else 0) + 1)
+    
+    if known.get('codes') != codes.sha256:
+        conn.execute('DELETE FROM codes')
+        conn.executemany('INSERT INTO codes (code, name) VALUES (?, ?)',
+                         ((str(code), str(name)) for code, name in load_json(codes).items()))
+    
+    for doc_type, cached in feeds.items():
+        # last_seen är senaste synken där dokumentet fanns i flödet, även om flödet var oförändrat
+        conn.execute('UPDATE documents SET last_seen = ? WHERE document_type = ?', (now, doc_type))
+        # Flöden vars innehåll inte ändrats sedan förra synken parsas inte alls
+        if known.get(doc_type) == cached.sha256:
+            continue
+        
+        # Bara nya och ändrade dokument skrivs, och dokument som försvunnit från
+        # flödet tas bort; seconds är tiden för att parsa och jämföra flödet
+        start = time.perf_counter()
+        existing = dict(conn.execute('SELECT id, hash FROM documents WHERE document_type = ?', (doc_type,)))
+        seen = set()
+        inserted = []
+        updated = []
+        
+        for doc in iter_feed(doc_type, cached):
+            key = _document_key(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            data = json.dumps(doc, ensure_ascii=False)
+            digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+            old_digest = existing.get(key)
+            if old_digest is None:
+                inserted.append((next(rowids), doc_type, key, data, digest, now, now))
+            elif old_digest != digest:
+                updated.append((data, digest, doc_type, key))
+        
+        removed = [(doc_type, key) for key in existing if key not in seen]
+        seconds = time.perf_counter() - start
+        
+        conn.executemany('DELETE FROM documents WHERE document_type = ? AND id = ?', removed)
+        conn.executemany('UPDATE documents SET data = ?, hash = ? WHERE document_type = ? AND id = ?', updated)
+        conn.executemany('INSERT INTO documents (rowid, document_type, id, data, hash, first_seen, last_seen) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', inserted)
+        stats[doc_type] = SyncStats(len(inserted), len(updated), len(removed), seconds)
+    
+    sources = [('codes', codes.sha256)] + [(doc_type, cached.sha256) for doc_type, cached in feeds.items()]
+    conn.executemany('INSERT OR REPLACE INTO sources (source, sha256, synced_at) VALUES (?, ?, ?)',
+                     ((source, sha256, now) for source, sha256 in sources))
+    conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('last_rowid', ?)", (next(rowids) - 1,))
+    conn.commit()
+    return stats
+
+def store_is_fresh(conn, doc_types=None, max_age=STORE_MAX_AGE):
+    """Kontrollera om lagret har synkats mot g0v.se inom max_age"""
+    sources = ['codes'] + [doc_type for doc_type, _ in FEEDS if not doc_types or doc_type in doc_types]
+    synced = dict(conn.execute('SELECT source, synced_at FROM sources'))
+    if any(source not in synced for source in sources):
+        return False
+    oldest = min(datetime.fromisoformat(synced[source]) for source in sources)
+    return datetime.now() - oldest < max_age
+
+def load_codes(conn):
+    """Läs kodtabellen (kod -> namn) från lagret"""
+    return dict(conn.execute('SELECT code, name FROM codes'))
+
+def load_code_table(conn):
+    """Kodtabellen från lagret som CodeTable"""
+    return CodeTable(load_codes(conn))
+
+def iter_document_rows(conn, doc_types=None):
+    """Strömma (dokumenttyp, JSON-text) ur lagret i FEEDS-ordning utan att avkoda"""
+    for doc_type, _ in FEEDS:
+        if doc_types and doc_type not in doc_types:
+            continue
+        for (data,) in conn.execute('SELECT data FROM documents WHERE document_type = ? ORDER BY rowid', (doc_type,)):
+            yield doc_type, data
+
+def update_store(doc_types=None, force=False):
+    """Hämta från g0v.se och synka lagret om det inte redan är färskt; returnerar (conn, codes, feeds)"""
+    # codes och feeds är None om lagret redan var färskt och inget hämtades
+    conn = open_store()
+    if not force and store_is_fresh(conn, doc_types):
+        return conn, None, None
+    codes, feeds = fetch_all(doc_types)
+    sync_store(conn, codes, feeds)
+    return conn, codes, feeds
+
+def store_version(conn):
+    """Fingeravtryck för lagrets innehåll; ändras varje gång någon källa synkats om"""
+    digest = hashlib.sha1()
+    for source, sha256 in conn.execute('SELECT source, sha256 FROM sources ORDER BY source'):
+        digest.update(f"{source}={sha256};".encode('utf-8'))
+    return digest.hexdigest()
+
+def tokenize(text):
+    """Dela upp text i gemena ord"""
+    return _WORD.findall(text.lower())
+
+def _flatten(postings):
+    """Listor av heltal som (startpositioner, värden); lista k är värden[start[k]:start[k + 1]]"""
+    offsets = array('I', [0])
+    values = array('I')
+    for items in postings:
+        values.extend(items)
+        offsets.append(len(values))
+    return offsets, values
+
+def _align(offset, alignment=8):
+    return -(-offset // alignment) * alignment
+
+_SECTION_HEADER = struct.Struct('<8sII')
+
+def _write_sections(path, magic, file_format, header, sections):
+    """Skriv en sektionsfil (MAGIC, FORMAT, JSON-rubrik och sektioner) atomärt till path"""
+    # Sektionernas placering räknas från datadelens början, var och en på en 8-byte-gräns
+    layout = {}
+    offset = 0
+    for name, section in sections.items():
+        typecode = section.typecode if isinstance(section, array) else 'B'
+        size = len(section) * (section.itemsize if isinstance(section, array) else 1)
+        layout[name] = [offset, typecode, size]
+        offset = _align(offset + size)
+    header = json.dumps(dict(header, sections=layout), ensure_ascii=False).encode('utf-8')
+
+    # Egen temporärfil per skrivare: flera processer kan bygga samma fil samtidigt,
+    # och den som byter in sin fil sist vinner
+    fd, tmp_file = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_SECTION_HEADER.pack(magic, file_format, len(header)))
+            f.write(header)
+            data_start = _align(_SECTION_HEADER.size + len(header))
+            for name, section in sections.items():
+                f.write(b'\0' * (data_start + layout[name][0] - f.tell()))
+                f.write(section)
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def _map_sections(path, magic, file_format):
+    """Öppna en sektionsfil med mmap; (mmap, rubrik, datadelens början) eller None"""
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        file_magic, file_version, header_size = _SECTION_HEADER.unpack_from(mapped)
+        if file_magic != magic or file_version != file_format:
+            mapped.close()
+            return None
+        header = json.loads(mapped[_SECTION_HEADER.size:_SECTION_HEADER.size + header_size])
+    except (struct.error, ValueError):
+        mapped.close()
+        return None
+    return mapped, header, _align(_SECTION_HEADER.size + header_size)
+
+def _section_views(mapped, header, data_start):
+    """Sektionerna i en mappad sektionsfil som memoryview med rätt typ"""
+    view = memoryview(mapped)
+    sections = {}
+    for name, (offset, typecode, size) in header['sections'].items():
+        start = data_start + offset
+        sections[name] = view[start:start + size].cast(typecode)
+    return sections
+
+class CorpusSnapshot:
+    """Det normaliserade lagret med sökindex som en binär ögonblicksbild, öppnad med mmap"""
+    
+    # Filen är en lokal cache i maskinens byteordning: MAGIC, FORMAT, en JSON-rubrik
+    # (version, dokumenttypernas intervall, kodtabellen, sektionernas placering) och
+    # sektioner med kolumner av fast bredd samt heapar med text, koder och postningar.
+    # Sektionerna läses som memoryview, så en ny process söker direkt utan att tolka
+    # JSON eller skapa objekt per dokument, och processer delar kopian via sidcachen.
+    # Dokumenten numreras i FEEDS-ordning så att varje dokumenttyp är ett intervall;
+    # by_date och dates gör ett datumintervall till två binärsökningar.
+    MAGIC = b'G0VSNAP\n'
+    FORMAT = 1
+    TEXT_COLUMNS = ('id', 'title', 'summary', 'url')
+    CODE_COLUMNS = ('senders', 'categories')
+    
+    def __init__(self, mapped, header, data_start):
+        self._mmap = mapped
+        self.version = header['version']
+        self.count = header['count']
+        self.type_ranges = {doc_type: tuple(bounds) for doc_type, bounds in header['type_ranges'].items()}
+        self.codes = CodeTable(header['names'])
+        # Koderna i sektionerna är nummer i rubrikens kodlista
+        self.code_list = [self.codes.intern(code) for code in header['codes']]
+        self.code_numbers = {code: number for number, code in enumerate(self.code_list)}
+        
+        self._sections = _section_views(mapped, header, data_start)
+        # Ordlistan söks direkt i filen; orden är sorterade och åtskilda av radbrytningar
+        offset, _, size = header['sections']['words']
+        self._words = (data_start + offset, data_start + offset + size)
+        self._word_cache = {}
+    
+    @classmethod
+    def write(cls, conn, path, version):
+        """Bygg ögonblicksbilden i ett svep över lagret och skriv den atomärt till path"""
+        codes = load_code_table(conn)
+        documents = []
+        rowids = array('q')
+        words = defaultdict(lambda: array('I'))
+        type_ranges = {}
+        
+        for doc_type, _ in FEEDS:
+            start = len(rowids)
+            for rowid, data in conn.execute('SELECT rowid, data FROM documents WHERE document_type = ? ORDER BY rowid', (doc_type,)):
+                doc = Document.from_json(data, codes)
+                position = len(rowids)
+                rowids.append(rowid)
+                documents.append(doc)
+                for word in set(tokenize(doc.text())):
+                    words[word].append(position)
+            type_ranges[doc_type] = [start, len(rowids)]
+        
+        published = array('I', (doc.published for doc in documents))
+        sections = {'rowid': rowids, 'type': array('B', (doc.type_index for doc in documents)), 'published': published}
+        for name in cls.TEXT_COLUMNS:
+            encoded = [text.encode('utf-8') for text in map(attrgetter(name), documents)]
+            sections[name + '_offsets'] = array('I', [0])
+            sections[name + '_offsets'].extend(accumulate(map(len, encoded)))
+            sections[name] = b''.join(encoded)
+        code_numbers = {}
+        for name in cls.CODE_COLUMNS:
+            offsets = array('I', [0])
+            values = array('I')
+            postings = defaultdict(lambda: array('I'))
+            for position, doc_codes in enumerate(map(attrgetter(name), documents)):
+                for code in doc_codes:
+                    number = code_numbers.setdefault(code, len(code_numbers))
+                    values.append(number)
+                    postings[number].append(position)
+                offsets.append(len(values))
+            sections[name + '_offsets'], sections[name] = offsets, values
+            sections[name + '_postings'] = postings
+        del documents
+        for name in cls.CODE_COLUMNS:
+            sections[name + '_postings_offsets'], sections[name + '_postings'] = \
+                _flatten(sections[name + '_postings'].get(number, ()) for number in range(len(code_numbers)))
+        sorted_words = sorted(words)
+        sections['words'] = '\n'.join(sorted_words).encode('utf-8')
+        sections['word_starts'] = array('I', [0])
+        sections['word_starts'].extend(accumulate(len(word.encode('utf-8')) + 1 for word in sorted_words))
+        sections['word_postings_offsets'], sections['word_postings'] = _flatten(words[word] for word in sorted_words)
+        del words
+        sections['by_date'] = array('I', sorted(range(len(published)), key=published.__getitem__))
+        sections['dates'] = array('I', (published[position] for position in sections['by_date']))
+        
+        _write_sections(path, cls.MAGIC, cls.FORMAT, {
+            'version': version,
+            'count': len(rowids),
+            'type_ranges': type_ranges,
+            'names': load_codes(conn),
+            'codes': list(code_numbers)
+        }, sections)
+    
+    @classmethod
+    def open(cls, path):
+        """Öppna en ögonblicksbild med mmap, None om den saknas eller har fel format"""
+        opened = _map_sections(path, cls.MAGIC, cls.FORMAT)
+        return cls(*opened) if opened else None
+    
+    def _slice(self, name, number):
+        """Lista number i en sektion med startpositioner i name_offsets"""
+        offsets = self._sections[name + '_offsets']
+        return self._sections[name][offsets[number]:offsets[number + 1]]
+    
+    def _text(self, name, position):
+        return str(self._slice(name, position), 'utf-8')
+    
+    def text(self, position):
+        """Den sökbara texten för dokumentet: titel, sammanfattning och id"""
+        return self._text('title', position) + ' ' + self._text('summary', position) + ' ' + self._text('id', position)
+    
+    def document(self, position):
+        """Dokumentet som Document, avkodat direkt ur filen"""
+        return Document(
+            self._sections['type'][position],
+            self._text('id', position),
+            self._text('title', position),
+            self._text('summary', position),
+            self._sections['published'][position],
+            self._text('url', position),
+            tuple(self.code_list[number] for number in self._slice('senders', position)),
+            tuple(self.code_list[number] for number in self._slice('categories', position))
+        )
+    
+    def iter_documents(self):
+        """Alla dokument som Document, i FEEDS-ordning som i lagret"""
+        return map(self.document, range(self.count))
+    
+    def _word_postings(self, query_word):
+        """Dokument med något ord som innehåller query_word (delsträngssök som tidigare)"""
+        postings = self._word_cache.get(query_word)
+        if postings is None:
+            postings = set()
+            needle = query_word.encode('utf-8')
+            start, end = self._words
+            word_starts = self._sections['word_starts']
+            found = self._mmap.find(needle, start, end)
+            while found != -1:
+                word = bisect_right(word_starts, found - start) - 1
+                postings.update(self._slice('word_postings', word))
+                # Fortsätt efter ordet så att varje ord bara räknas en gång
+                found = self._mmap.find(needle, start + word_starts[word + 1], end)
+            self._word_cache[query_word] = postings
+        return postings
+    
+    def _code_postings(self, name, names):
+        """Dokument med någon kod vars namn innehåller något av names"""
+        postings = set()
+        for code in self.codes.matching(names):
+            number = self.code_numbers.get(code)
+            if number is not None:
+                postings.update(self._slice(name + '_postings', number))
+        return postings
+    
+    def _date_postings(self, dates):
+        """Dokument publicerade inom dates, (från, till) som heltal ÅÅÅÅMMDD"""
+        date_from, date_to = dates
+        sorted_dates = self._sections['dates']
+        return set(self._sections['by_date'][bisect_left(sorted_dates, date_from):bisect_right(sorted_dates, date_to)])
+    
+    def search(self, search_term, doc_types=None, departments=None, categories=None, dates=None):
+        """Returnera (dokumentnummer, behöver_kontroll); dates kommer från date_bounds()"""
+        # Kandidaterna är en övermängd till träffarna när söktermen består av flera
+        # ord eller innehåller skiljetecken; då måste texten kontrolleras
+        term = search_term.lower()
+        term_words = tokenize(term)
+        candidates = None
+        
+        for word in term_words:
+            postings = self._word_postings(word)
+            candidates = postings if candidates is None else candidates & postings
+            if not candidates:
+                return [], False
+        
+        if departments:
+            postings = self._code_postings('senders', departments)
+            candidates = postings if candidates is None else candidates & postings
+        
+        if categories:
+            postings = self._code_postings('categories', categories)
+            candidates = postings if candidates is None else candidates & postings
+        
+        if dates:
+            postings = self._date_postings(dates)
+            candidates = postings if candidates is None else candidates & postings
+        
+        ranges = [self.type_ranges[doc_type] for doc_type, _ in FEEDS
+                  if doc_type in self.type_ranges and (not doc_types or doc_type in doc_types)]
+        if candidates is None:
+            positions = [position for start, end in ranges for position in range(start, end)]
+        else:
+            positions = sorted(position for position in candidates
+                               if any(start <= position < end for start, end in ranges))
+        
+        return positions, bool(term) and term_words != [term]
+    
+    def iter_rows(self, conn, positions):
+        """Läs dokumenten för dokumentnumren ur lagret (som dict), i samma ordning"""
+        rowids = self._sections['rowid']
+        return _iter_rows(conn, [rowids[position] for position in positions])
+
+def _iter_rows(conn, rowids, batch_size=500):
+    """Läs dokumenten med rowids ur lagret, i samma ordning"""
+    for i in range(0, len(rowids), batch_size):
+        batch = rowids[i:i + batch_size]
+        placeholders = ','.join('?' * len(batch))
+        rows = dict(conn.execute(f'SELECT rowid, data FROM documents WHERE rowid IN ({placeholders})', batch))
+        for rowid in batch:
+            yield json.loads(rows[rowid])
+
+_snapshot = None
+
+def get_snapshot(conn):
+    """Ögonblicksbilden för lagrets aktuella innehåll: redan öppen, från disk eller nybyggd"""
+    global _snapshot
+    version = store_version(conn)
+    if _snapshot is None or _snapshot.version != version:
+        # En gammal mappning släpps innan filen ersätts (krävs på Windows)
+        _snapshot = None
+        snapshot = CorpusSnapshot.open(SNAPSHOT_FILE)
+        if snapshot is None or snapshot.version != version:
+            snapshot = None
+            CorpusSnapshot.write(conn, SNAPSHOT_FILE, version)
+            # Hann en annan process byta in sin fil efter vår öppnas den; innehållet är detsamma
+            snapshot = CorpusSnapshot.open(SNAPSHOT_FILE)
+        _snapshot = snapshot
+    return _snapshot
+
+class _PageText(HTMLParser):
+    """Synlig text i en HTML-sida, utan skript, stilar och navigering"""
+    
+    SKIP = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'header', 'footer'}
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.main_text = []
+        self.skipping = 0
+        self.in_main = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+        elif tag == 'main':
+            self.in_main += 1
+    
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self.skipping = max(self.skipping - 1, 0)
+        elif tag == 'main':
+            self.in_main = max(self.in_main - 1, 0)
+    
+    def handle_data(self, data):
+        if not self.skipping:
+            self.text.append(data)
+            if self.in_main:
+                self.main_text.append(data)
+
+def extract_page_text(html):
+    """Sidans text med blanksteg normaliserade"""
+    parser = _PageText()
+    parser.feed(html)
+    parser.close()
+    # Finns ett <main>-element används bara texten i det
+    return ' '.join(' '.join(parser.main_text or parser.text).split())
+
+def _page_file(url):
+    """Cachefil för en dokumentsida, t.ex. .cache/pages/3f/3f2a….html.gz"""
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(PAGES_DIR, digest[:2], digest + '.html.gz')
+
+def _fetch_page(session, url, etag, last_modified):
+    """Hämta en dokumentsida; returnerar (status, etag, last_modified, text), text är None vid 304"""
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    response = session.get(REGERINGEN_BASE_URL + url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return 304, etag, last_modified, None
+    # Borttagna sidor sparas utan text så att de inte hämtas igen
+    if response.status_code in (404, 410):
+        return response.status_code, None, None, ''
+    response.raise_for_status()
+    
+    body = response.content
+    page_file = _page_file(url)
+    os.makedirs(os.path.dirname(page_file), exist_ok=True)
+    with open(page_file + '.tmp', 'wb') as f:
+        f.write(gzip.compress(body, mtime=0))
+    os.replace(page_file + '.tmp', page_file)
+    
+    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+    return (response.status_code, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+            extract_page_text(body.decode(encoding or 'utf-8', 'replace')))
+
+def crawl_pages(conn, workers=CRAWL_WORKERS, recrawl=False, limit=None):
+    """Hämta dokumentsidorna bakom doc.url till tabellen pages; returnerar CrawlStats"""
+    # Inkrementell per URL: bara sidor som inte hämtats förut, om inte recrawl
+    # anges (då med villkorliga anrop mot sparad ETag). Misslyckade sidor
+    # försöks igen nästa gång.
+    start = time.perf_counter()
+    known = {url: (etag, last_modified) for url, etag, last_modified
+             in conn.execute('SELECT url, etag, last_modified FROM pages')}
+    urls = []
+    for (data,) in conn.execute('SELECT data FROM documents ORDER BY rowid'):
+        url = str(json.loads(data).get('url') or '')
+        if url.startswith('/') and (recrawl or url not in known):
+            urls.append(url)
+    urls = list(dict.fromkeys(urls))[:limit]
+    
+    fetched = not_modified = failed = 0
+    rows = []
+    
+    # Texten sparas i omgångar, så en avbruten körning behöver inte göras om;
+    # svaren själva sparas komprimerade i PAGES_DIR av _fetch_page()
+    def save(rows):
+        conn.executemany('INSERT OR REPLACE INTO pages (url, status, etag, last_modified, text, fetched_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', rows)
+        conn.commit()
+        rows.clear()
+    
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    queue = iter(urls)
+    pending = {}
+    # Högst workers anrop pågår samtidigt och bara ett par per arbetare ligger i kö
+    with closing(session), ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            for url in queue:
+                pending[executor.submit(_fetch_page, session, url, *known.get(url, (None, None)))] = url
+                return
+        
+        for _ in range(2 * workers):
+            submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                submit()
+                try:
+                    status, etag, last_modified, text = future.result()
+                except requests.RequestException as e:
+                    failed += 1
+                    print(f"Varning: kunde inte hämta {url}: {e}")
+                    continue
+                if text is None:
+                    not_modified += 1
+                    continue
+                fetched += 1
+                rows.append((url, status, etag, last_modified, text, datetime.now().isoformat(timespec='seconds')))
+            if len(rows) >= 500:
+                save(rows)
+    save(rows)
+    return CrawlStats(fetched, not_modified, failed, time.perf_counter() - start)
+
+def load_page_texts(conn):
+    """Crawlad text per dokument-URL"""
+    return dict(conn.execute("SELECT url, text FROM pages WHERE text != ''"))
+
+def fulltext_version(conn):
+    """Fingeravtryck för lagret plus de crawlade sidorna"""
+    count, latest = conn.execute('SELECT COUNT(*), MAX(fetched_at) FROM pages').fetchone()
+    return hashlib.sha1(f"{store_version(conn)};pages={count};{latest}".encode('utf-8')).hexdigest()
+
+class FullTextIndex:
+    """BM25-rankat index över titel, sammanfattning, id och dokumentsidans text"""
+    
+    # Orden vikas som i sidans sökindex och matchas som hela ord; ett dokument
+    # är en träff om det innehåller alla sökord. Postningarna är per ord
+    # (dokumentnummer, antal förekomster). rowids kopplar dokumentnumren till
+    # lagret när indexet byggts därifrån.
+    
+    # Sparat index har samma sektionsformat som ögonblicksbilden och öppnas med mmap
+    MAGIC = b'G0VFTIX\n'
+    FORMAT = 2
+    
+    def __init__(self, version, rowids, lengths, postings, average_length=None):
+        self.version = version
+        self.rowids = rowids
+        self.lengths = lengths
+        self.postings = postings
+        if average_length is None:
+            average_length = sum(lengths) / len(lengths) if lengths else 0
+        self.average_length = average_length
+    
+    @classmethod
+    def from_texts(cls, texts, version=None, rowids=None):
+        """Indexera texterna; dokumentnumret är positionen i texts"""
+        lengths = array('I')
+        postings = defaultdict(lambda: (array('I'), array('I')))
+        for position, text in enumerate(texts):
+            counts = Counter(_WORD.findall(fold(text)))
+            lengths.append(sum(counts.values()))
+            for word, count in counts.items():
+                positions, frequencies = postings[word]
+                positions.append(position)
+                frequencies.append(count)
+        return cls(version, rowids, lengths, dict(postings))
+    
+    @classmethod
+    def build(cls, conn, version):
+        """Bygg indexet över lagret i FEEDS-ordning, med crawlad text där den finns"""
+        page_texts = load_page_texts(conn)
+        rowids = array('q')
+        
+        def texts():
+            for doc_type, _ in FEEDS:
+                for rowid, data in conn.execute('SELECT rowid, data FROM documents WHERE document_type = ? '
+                                                'ORDER BY rowid', (doc_type,)):
+                    doc = json.loads(data)
+                    rowids.append(rowid)
+                    yield ' '.join((str(doc.get('title') or ''), str(doc.get('summary') or ''),
+                                    str(doc.get('id') or ''), page_texts.get(str(doc.get('url') or ''), '')))
+        
+        return cls.from_texts(texts(), version, rowids)
+    
+    @classmethod
+    def load(cls, path):
+        """Öppna ett sparat index med mmap, None om det saknas eller har gammalt format"""
+        opened = _map_sections(path, cls.MAGIC, cls.FORMAT)
+        if opened is None:
+            return None
+        mapped, header, data_start = opened
+        sections = _section_views(mapped, header, data_start)
+        return cls(header['version'], sections['rowids'], sections['lengths'],
+                   _MappedPostings(sections), header['average_length'])
+    
+    def save(self, path):
+        words = sorted(self.postings)
+        sections = {'rowids': self.rowids if self.rowids is not None else array('q'), 'lengths': self.lengths}
+        sections['words'] = '\n'.join(words).encode('utf-8')
+        sections['word_starts'] = array('I', [0])
+        sections['word_starts'].extend(accumulate(len(word.encode('utf-8')) + 1 for word in words))
+        sections['postings_offsets'], sections['positions'] = _flatten(self.postings[word][0] for word in words)
+        _, sections['frequencies'] = _flatten(self.postings[word][1] for word in words)
+        _write_sections(path, self.MAGIC, self.FORMAT,
+                        {'version': self.version, 'average_length': self.average_length}, sections)
+    
+    def search(self, query_words):
+        """BM25-poäng per dokument som innehåller alla query_words"""
+        total = len(self.lengths)
+        scores = None
+        for word in dict.fromkeys(query_words):
+            positions, frequencies = self.postings.get(word, ((), ()))
+            idf = math.log(1 + (total - len(positions) + 0.5) / (len(positions) + 0.5))
+            word_scores = {}
+            for position, frequency in zip(positions, frequencies):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / self.average_length)
+                word_scores[position] = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {position: score + word_scores[position]
+                          for position, score in scores.items() if position in word_scores}
+            if not scores:
+                break
+        return scores or {}
+
+class _MappedPostings:
+    """Postningarna i ett mappat fulltextindex, uppslagna med binärsökning i den sorterade ordlistan"""
+    
+    def __init__(self, sections):
+        self.words = sections['words']
+        self.word_starts = sections['word_starts']
+        self.offsets = sections['postings_offsets']
+        self.positions = sections['positions']
+        self.frequencies = sections['frequencies']
+    
+    def __len__(self):
+        return len(self.word_starts) - 1
+    
+    def _word(self, number):
+        return bytes(self.words[self.word_starts[number]:self.word_starts[number + 1] - 1])
+    
+    def get(self, word, default=None):
+        """(dokumentnummer, antal förekomster) för word, default om ordet saknas"""
+        # UTF-8 sorterar som teckenkoderna, så ordlistan är sorterad även som bytes
+        needle = word.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._word(middle) < needle:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self) or self._word(low) != needle:
+            return default
+        start, end = self.offsets[low], self.offsets[low + 1]
+        return self.positions[start:end], self.frequencies[start:end]
+
+_fulltext_index = None
+
+def get_fulltext_index(conn):
+    """Fulltextindex för lagret och de crawlade sidorna: från minnet, från disk eller nybyggt"""
+    global _fulltext_index
+    version = fulltext_version(conn)
+    if _fulltext_index is None or _fulltext_index.version != version:
+        # En gammal mappning släpps innan filen ersätts (krävs på Windows)
+        _fulltext_index = None
+        index = FullTextIndex.load(FULLTEXT_INDEX_FILE)
+        if index is None or index.version != version:
+            index = None
+            FullTextIndex.build(conn, version).save(FULLTEXT_INDEX_FILE)
+            index = FullTextIndex.load(FULLTEXT_INDEX_FILE)
+        _fulltext_index = index
+    return _fulltext_index
+
+def _shard_year(published):
+    """Årtal för datafilsindelningen, 'undated' för dokument utan giltigt datum"""
+    return str(published // 10000) if published else 'undated'
+
+def _date_int(published):
+    """Publiceringsdatum som heltal ÅÅÅÅMMDD, 0 om datum saknas eller är ogiltigt"""
+    match = _DATE.match(str(published or ''))
+    return int(match.group(1) + match.group(2) + match.group(3)) if match else 0
+
+def date_bounds(date_from=None, date_to=None):
+    """Datumintervall som heltal (från, till) ÅÅÅÅMMDD, None om inget av dem anges"""
+    # Gränserna kan vara 'ÅÅÅÅ', 'ÅÅÅÅ-MM' eller 'ÅÅÅÅ-MM-DD' (eller samma siffror
+    # utan bindestreck) och båda ingår; 2024-03 som till-gräns betyder till och med
+    # sista mars. Dokument utan datum (0) ligger utanför alla intervall.
+    if not date_from and not date_to:
+        return None
+    
+    def bound(value, end):
+        if not value:
+            return 99991231 if end else 1
+        digits = re.sub(r'\D', '', str(value))
+        padding = {4: '1231' if end else '0101', 6: '31' if end else '01', 8: ''}.get(len(digits))
+        if padding is None:
+            raise ValueError(f"Ogiltigt datum: {value!r}")
+        return int(digits + padding)
+    
+    return bound(date_from, False), bound(date_to, True)
+
+def _code_value(code):
+    """Kod som heltal när den är numerisk (som i g0v.se), annars som sträng"""
+    code = str(code)
+    return int(code) if code.isdigit() else code
+
+class CodeTable:
+    """Kodtabellen från codes.json, klassificerad en gång per körning"""
+    
+    # Giltiga departement-suffix och specialfall
+    DEPARTMENT_ENDINGS = ('departementet', 'Statsrådsberedningen', 'Regeringen', 'Regeringskansliet')
+    
+    def __init__(self, names):
+        self._codes = {}
+        self.names = {self.intern(code): name for code, name in names.items()}
+        self.departments = {code for code, name in self.names.items() if name.endswith(self.DEPARTMENT_ENDINGS)}
+    
+    def intern(self, code):
+        # Heltal när koden är numerisk, som i g0v.se; varje kod finns bara en gång
+        # i minnet oavsett hur många dokument som har den
+        key = str(code)
+        value = self._codes.get(key)
+        if value is None:
+            value = self._codes[key] = _code_value(key)
+        return value
+    
+    def name(self, code, unknown='Okänt'):
+        return self.names.get(code, f"{unknown} ({code})")
+    
+    def matching(self, names):
+        """Koder vars namn innehåller något av names, utan hänsyn till versaler"""
+        names = [name.lower() for name in names]
+        return {code for code, code_name in self.names.items() if any(name in code_name.lower() for name in names)}
+
+_TYPE_INDEX = {doc_type: i for i, doc_type in enumerate(DOCUMENT_TYPES)}
+
+class Document:
+    """Ett dokument i kompakt form, gemensamt för bygget och sökningarna"""
+    
+    # Dokumenttypen är ett index i DOCUMENT_TYPES, datumet ett heltal ÅÅÅÅMMDD
+    # (0 = okänt) och avsändare/kategorier tupler av internade koder utan dubbletter
+    __slots__ = ('type_index', 'id', 'title', 'summary', 'published', 'url', 'senders', 'categories')
+    
+    def __init__(self, type_index, doc_id, title, summary, published, url, senders, categories):
+        self.type_index = type_index
+        self.id = doc_id
+        self.title = title
+        self.summary = summary
+        self.published = published
+        self.url = url
+        self.senders = senders
+        self.categories = categories
+    
+    @classmethod
+    def from_feed(cls, doc, codes):
+        """Tolka ett dokument ur ett flöde (dict) mot kodtabellen codes"""
+        return cls(
+            _TYPE_INDEX[doc['document_type']],
+            str(doc.get('id') or ''),
+            str(doc.get('title') or ''),
+            str(doc.get('summary') or ''),
+            _date_int(doc.get('published')),
+            str(doc.get('url') or ''),
+            tuple(dict.fromkeys(map(codes.intern, doc.get('senders') or []))),
+            tuple(dict.fromkeys(map(codes.intern, doc.get('categories') or [])))
+        )
+    
+    @classmethod
+    def from_json(cls, data, codes):
+        return cls.from_feed(json.loads(data), codes)
+    
+    def text(self):
+        """Den sökbara texten: titel, sammanfattning och id"""
+        return self.title + ' ' + self.summary + ' ' + self.id
+
+def _shard_columns(documents):
+    """Lägg dokument i kolumner; avsändare och kategorier som platta listor med antal per dokument"""
+    columns = {
+        'type': [], 'id': [], 'title': [], 'summary': [], 'published': [], 'url': [],
+        'senderCount': [], 'senders': [], 'categoryCount': [], 'categories': []
+    }
+    for doc in documents:
+        columns['type'].append(doc.type_index)
+        columns['id'].append(doc.id)
+        columns['title'].append(doc.title)
+        columns['summary'].append(doc.summary)
+        columns['published'].append(doc.published)
+        columns['url'].append(doc.url)
+        columns['senderCount'].append(len(doc.senders))
+        columns['senders'].extend(doc.senders)
+        columns['categoryCount'].append(len(doc.categories))
+        columns['categories'].extend(doc.categories)
+    return columns
+
+def order_shards(documents_by_year, max_documents=SHARD_MAX_DOCUMENTS):
+    """Dela in kodade dokument i datafiler per år, nyaste först; returnerar [(nyckel, dokument)]"""
+    # Ordningen är den sidan laddar dem i, sorterad på publiceringsdatum (nyaste
+    # först, odaterade sist); dokumentens position i den är deras nummer i sidans filter
+    years = sorted((year for year in documents_by_year if year != 'undated'), reverse=True)
+    if 'undated' in documents_by_year:
+        years.append('undated')
+    
+    shards = []
+    for year in years:
+        documents = sorted(documents_by_year[year], key=lambda doc: doc.published, reverse=True)
+        # Stora år delas upp i flera filer
+        parts = range(0, len(documents), max_documents)
+        for part, start in enumerate(parts, 1):
+            key = year if len(parts) == 1 else f"{year}-{part}"
+            shards.append((key, documents[start:start + max_documents]))
+    return shards
+
+def order_view_shards(documents, max_documents=SHARD_MAX_DOCUMENTS):
+    """Dela in en vys dokument i datafiler om högst max_documents, nyaste först"""
+    # En vy är ett litet urval, så åren slås ihop i stället för en fil per år.
+    # Nyckeln är året för filens nyaste dokument, som sidan visar när den laddar.
+    documents = sorted(documents, key=lambda doc: doc.published, reverse=True)
+    parts = range(0, len(documents), max_documents)
+    shards = []
+    for part, start in enumerate(parts, 1):
+        year = _shard_year(documents[start].published)
+        shards.append((year if len(parts) == 1 else f"{year}-{part}", documents[start:start + max_documents]))
+    return shards
+
+def build_timeline(documents):
+    """Tidslinjen över dokument i laddningsordning: [[ÅÅÅÅMM, första dokumentnummer]]"""
+    # Dokumenten är sorterade på datum, nyaste först, så varje månad är ett
+    # sammanhängande intervall som slutar där nästa börjar; månad 0 är de
+    # odaterade sist. Ett datumintervall blir därmed två binärsökningar.
+    timeline = []
+    for position, doc in enumerate(documents):
+        month = doc.published // 100
+        if not timeline or timeline[-1][0] != month:
+            timeline.append([month, position])
+    return timeline
+
+def _compressors():
+    """Förkomprimeringar som (filändelse, funktion); .br bara om brotli finns"""
+    yield '.gz', lambda content: gzip.compress(content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda content: brotli.compress(content, quality=11)
+
+def write_static_file(name, content, extension, directory):
+    """Skriv content som en innehållshashad fil och returnera sökvägen för sidan"""
+    # Oförändrat innehåll får samma filnamn och varken skrivs eller komprimeras om
+    content = content.encode('utf-8')
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    file_name = f"{name}.{digest}{extension}"
+    path = os.path.join(directory, file_name)
+    os.makedirs(directory, exist_ok=True)
+    # Förkomprimerade .gz- och .br-syskon som servern kan skicka direkt
+    for suffix, compress in _compressors():
+        if not os.path.exists(path + suffix):
+            with open(path + suffix, 'wb') as f:
+                f.write(compress(content))
+    # Själva filen skrivs sist så att den bara finns när syskonen gör det
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            f.write(content)
+    return f"{directory}/{file_name}"
+
+def _gzip_stream(level=9):
+    """Strömmande gzip som (komprimera, avsluta)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def _compressed(chunks, compress, finish):
+    """Komprimera en ström av bytes-delar; tomma delar hoppas över"""
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    data = finish()
+    if data:
+        yield data
+
+def write_gzip_file(name, chunks, directory):
+    """Skriv en ström av bytes-delar gzippad till directory/name atomärt; returnerar sökvägen"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path + '.tmp', 'wb') as f:
+        for data in _compressed(chunks, *_gzip_stream(EXPORT_GZIP_LEVEL)):
+            f.write(data)
+    os.replace(path + '.tmp', path)
+    return f"{directory}/{name}"
+
+def write_data_file(key, data, data_dir=DATA_DIR):
+    """Skriv data som en innehållshashad JSON-fil och returnera sökvägen för sidan"""
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return write_static_file(key, content, '.json', data_dir)
+
+def remove_stale_files(current, directory):
+    """Ta bort innehållshashade filer och deras syskon från tidigare byggen"""
+    current = {os.path.basename(path) for path in current}
+    for file_name in os.listdir(directory):
+        match = _STATIC_FILE.match(file_name)
+        if match and match.group(1) not in current:
+            os.remove(os.path.join(directory, file_name))
+
+def write_shards(ordered_shards, data_dir=DATA_DIR):
+    """Skriv dokumenten som kolumnfiler; returnerar manifestets fillista"""
+    return [{'key': key, 'file': write_data_file(key, _shard_columns(documents), data_dir), 'count': len(documents)}
+            for key, documents in ordered_shards]
+
+def _bit_bytes(positions, total):
+    """Dokumentnummer som bitmängd i bytes (little endian, bit i = dokument i)"""
+    bits = bytearray((total + 31) // 32 * 4)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return bits
+
+def encode_postings(positions, total):
+    """Koda en sorterad postningslista för sidan"""
+    # Täta listor blir en bitmängd (base64, bit i = dokument i), glesa en
+    # deltakodad lista; sidan gör om båda till bitmängder när de laddas
+    if len(positions) * 32 >= total:
+        return {'bits': base64.b64encode(_bit_bytes(positions, total)).decode('ascii')}
+    return {'deltas': [b - a for a, b in zip([0] + positions, positions)]}
+
+def write_facets(ordered_shards, department_codes, category_codes, data_dir=DATA_DIR):
+    """Skriv postningar per dokumenttyp, departement och kategori för sidans filter, en fil per datafil"""
+    # Positionerna är lokala i datafilen, så ett nytt dokument ändrar bara sin egen fils facetter
+    department_codes = set(department_codes)
+    category_codes = set(category_codes)
+    files = []
+    for key, documents in ordered_shards:
+        types = [[] for _ in DOCUMENT_TYPES]
+        senders = defaultdict(list)
+        categories = defaultdict(list)
+        for position, doc in enumerate(documents):
+            types[doc.type_index].append(position)
+            for sender in doc.senders:
+                if sender in department_codes:
+                    senders[sender].append(position)
+            for category in doc.categories:
+                if category in category_codes:
+                    categories[category].append(position)
+        
+        total = len(documents)
+        facets = {
+            'types': [encode_postings(positions, total) for positions in types],
+            'senders': {code: encode_postings(positions, total) for code, positions in senders.items()},
+            'categories': {code: encode_postings(positions, total) for code, positions in categories.items()}
+        }
+        files.append(write_data_file(f"facets-{key}", facets, data_dir))
+    return files
+
+def fold(text):
+    """Vik text för sökning: gemener och utan accenter, men å, ä och ö behålls"""
+    return unicodedata.normalize('NFC', text).lower().translate(_SEARCH_FOLD_TABLE)
+
+def write_client_search_index(ordered_shards, block_size=SEARCH_BLOCK_WORDS, data_dir=DATA_DIR):
+    """Skriv sidans sökindex över titel, sammanfattning och id, ett per datafil"""
+    # Varje datafil har en egen ordlista (sorterade, vikta ord) och postningslistor
+    # i block om block_size ord som laddas först när en sökning behöver dem. Listorna
+    # är deltakodade positioner i datafilen, så ett nytt dokument ändrar bara sin
+    # egen fils index och äldre års filer behåller sina namn.
+    shards = []
+    for key, documents in ordered_shards:
+        postings = defaultdict(list)
+        for position, doc in enumerate(documents):
+            for word in set(_WORD.findall(fold(doc.text()))):
+                postings[word].append(position)
+        
+        words = sorted(postings)
+        blocks = []
+        for start in range(0, len(words), block_size):
+            block = []
+            for word in words[start:start + block_size]:
+                positions = postings[word]
+                block.append([positions[0]] + [b - a for a, b in zip(positions, positions[1:])])
+            blocks.append(write_data_file(f"search-{key}-{start // block_size}", block, data_dir))
+        shards.append({'words': write_data_file(f"search-{key}-words", words, data_dir), 'blocks': blocks})
+    
+    return {
+        'shards': shards,
+        'blockSize': block_size,
+        'fold': SEARCH_FOLD
+    }
+
+def client_data_files(manifest):
+    """Alla datafiler som manifestet hänvisar till"""
+    search_files = [file for shard in manifest['search']['shards'] for file in [shard['words']] + shard['blocks']]
+    return [shard['file'] for shard in manifest['shards']] + search_files + manifest['facets'] + [manifest['cube']]
+
+def render_stylesheet():
+    """Returnera dashboardens CSS"""
+    return """
+            body {
                 font-family: Arial, sans-serif;
                 margin: 20px;
                 background-color: #f5f5f5;
-            }}
-            .container {{
+            }
+            .container {
                 max-width: 1600px;
                 margin: 0 auto;
-            }}
-            .header {{
+            }
+            .header {
                 background-color: #1a5490;
                 color: white;
                 padding: 20px;
                 border-radius: 5px;
                 margin-bottom: 20px;
-            }}
-            .filters {{
+            }
+            .header a {
+                color: white;
+            }
+            .filters {
                 display: grid;
                 grid-template-columns: 1fr 1fr 1fr;
                 gap: 20px;
                 margin-bottom: 20px;
-            }}
-            .filter-section {{
+            }
+            .filter-section {
                 background: white;
                 padding: 20px;
                 border-radius: 5px;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                 max-height: 400px;
                 overflow-y: auto;
-            }}
-            .filter-section h3 {{
+            }
+            .filter-section h3 {
                 margin-top: 0;
                 color: #1a5490;
                 position: sticky;
@@ -130,47 +1502,127 @@ def create_complete_dashboard():
                 background: white;
                 padding-bottom: 10px;
                 border-bottom: 2px solid #1a5490;
-            }}
-            .checkbox-item {{
+            }
+            .checkbox-item {
                 margin: 5px 0;
                 padding: 5px;
-            }}
-            .checkbox-item:hover {{
+            }
+            .checkbox-item:hover {
+                background-color: #f0f0f0;
+            }
+            .facet-count {
+                color: #666;
+                font-size: 0.85em;
+            }
+            .facet-empty {
+                color: #aaa;
+            }
+            .timeline {
+                background: white;
+                padding: 20px;
+                border-radius: 5px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+                margin-bottom: 20px;
+            }
+            .timeline-controls {
+                display: flex;
+                flex-wrap: wrap;
+                align-items: center;
+                gap: 15px;
+            }
+            .timeline-controls h3 {
+                margin: 0;
+                color: #1a5490;
+            }
+            .histogram {
+                display: flex;
+                align-items: stretch;
+                gap: 1px;
+                height: 80px;
+                margin-top: 15px;
+            }
+            .histogram-month {
+                flex: 1;
+                display: flex;
+                align-items: flex-end;
+                cursor: pointer;
+            }
+            .histogram-month:hover {
                 background-color: #f0f0f0;
-            }}
-            .results {{
+            }
+            .histogram-bar {
+                width: 100%;
+                background-color: #1a5490;
+            }
+            .histogram-bar.outside {
+                background-color: #c5d3e3;
+            }
+            .histogram-axis {
+                display: flex;
+                justify-content: space-between;
+                color: #666;
+                font-size: 0.85em;
+            }
+            .results {
                 background: white;
                 padding: 20px;
                 border-radius: 5px;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .document-item {{
+            }
+            #document-list {
+                position: relative;
+                height: 70vh;
+                overflow-y: auto;
+            }
+            .document-item {
+                position: absolute;
+                left: 0;
+                right: 0;
+                top: 0;
+                height: """ + str(ROW_HEIGHT) + """px;
+                box-sizing: border-box;
+                overflow: hidden;
                 border-bottom: 1px solid #eee;
                 padding: 15px 0;
-            }}
-            .document-item:last-child {{
-                border-bottom: none;
-            }}
-            .document-title {{
+            }
+            .document-title {
                 font-weight: bold;
                 color: #1a5490;
                 margin-bottom: 5px;
                 font-size: 1.1em;
-            }}
-            .document-meta {{
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+            }
+            .document-meta {
                 color: #666;
                 font-size: 0.9em;
                 margin-bottom: 5px;
-            }}
-            .document-summary {{
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+            }
+            .document-summary {
                 margin-top: 10px;
                 line-height: 1.5;
-            }}
-            .control-buttons {{
+                display: -webkit-box;
+                -webkit-line-clamp: 2;
+                -webkit-box-orient: vertical;
+                overflow: hidden;
+            }
+            .document-link {
+                margin-top: 5px;
+            }
+            .list-empty {
+                text-align: center;
+                color: #666;
+                padding: 40px;
+            }
+            .control-buttons {
                 margin: 20px 0;
                 text-align: center;
-            }}
-            button {{
+            }
+            button {
                 background-color: #1a5490;
                 color: white;
                 border: none;
@@ -178,101 +1630,1209 @@ def create_complete_dashboard():
                 margin: 0 5px;
                 border-radius: 3px;
                 cursor: pointer;
-            }}
-            button:hover {{
+            }
+            button:hover {
                 background-color: #2a6bb0;
-            }}
-            .result-count {{
+            }
+            .result-count {
                 font-weight: bold;
                 color: #1a5490;
                 margin-bottom: 10px;
                 font-size: 1.1em;
-            }}
-            input[type="checkbox"] {{
+            }
+            .load-status {
+                color: #666;
+                margin-bottom: 10px;
+            }
+            .load-status button {
+                margin-left: 10px;
+                padding: 5px 10px;
+            }
+            input[type="checkbox"] {
                 margin-right: 8px;
-            }}
-            .doc-type-badge {{
+            }
+            .doc-type-badge {
                 display: inline-block;
                 padding: 3px 8px;
                 border-radius: 3px;
                 font-size: 0.85em;
                 font-weight: bold;
                 margin-right: 10px;
-            }}
-            .badge-kd {{ background-color: #e3f2fd; color: #1565c0; }}
-            .badge-ds {{ background-color: #f3e5f5; color: #6a1b9a; }}
-            .badge-sou {{ background-color: #e8f5e9; color: #2e7d32; }}
-            .badge-ru {{ background-color: #fff3e0; color: #e65100; }}
-            .badge-rap {{ background-color: #fce4ec; color: #c2185b; }}
-            #searchBox {{
+            }
+            .badge-kd { background-color: #e3f2fd; color: #1565c0; }
+            .badge-ds { background-color: #f3e5f5; color: #6a1b9a; }
+            .badge-sou { background-color: #e8f5e9; color: #2e7d32; }
+            .badge-ru { background-color: #fff3e0; color: #e65100; }
+            .badge-rap { background-color: #fce4ec; color: #c2185b; }
+            #searchBox {
                 width: 100%;
                 padding: 12px;
                 font-size: 16px;
                 border: 1px solid #ddd;
                 border-radius: 3px;
                 margin-bottom: 20px;
-            }}
-            .stats {{
+            }
+            .stats {
                 display: grid;
                 grid-template-columns: repeat(6, 1fr);
                 gap: 15px;
                 margin-bottom: 20px;
-            }}
-            .stat-box {{
+            }
+            .stat-box {
                 background: #f8f9fa;
                 padding: 15px;
                 border-radius: 5px;
                 text-align: center;
-            }}
-            .stat-number {{
+            }
+            .stat-number {
                 font-size: 1.8em;
                 font-weight: bold;
                 color: #1a5490;
-            }}
-            .stat-label {{
+            }
+            .stat-label {
                 color: #666;
                 font-size: 0.85em;
-            }}
-            @media (max-width: 1200px) {{
-                .stats {{ grid-template-columns: repeat(3, 1fr); }}
-            }}
-            @media (max-width: 768px) {{
-                .filters {{ grid-template-columns: 1fr; }}
-                .stats {{ grid-template-columns: repeat(2, 1fr); }}
-            }}
-        </style>
+            }
+            @media (max-width: 1200px) {
+                .stats { grid-template-columns: repeat(3, 1fr); }
+            }
+            @media (max-width: 768px) {
+                .filters { grid-template-columns: 1fr; }
+                .stats { grid-template-columns: repeat(2, 1fr); }
+            }
+    """
+
+def render_script():
+    """Returnera dashboardens JavaScript; manifestet definieras i index.html"""
+    return """
+            const allCodes = manifest.codes;
+            const typeIndex = new Map(manifest.types.map((type, i) => [type, i]));
+            const badgeClasses = ['badge-kd', 'badge-ds', 'badge-sou', 'badge-ru', 'badge-rap'];
+            
+            // Dokumenten lagras kolumnvis; ett dokument är ett index i kolumnerna.
+            // Avsändare och kategorier ligger i platta listor med startposition per dokument.
+            const docs = {
+                length: 0,
+                type: [], id: [], title: [], summary: [], published: [], url: [],
+                senderStart: [0], senders: [],
+                categoryStart: [0], categories: []
+            };
+            let loadedShards = 0;
+            let loadingShards = null;
+            let currentFilteredDocuments = [];
+            let currentTotalMatches = 0;
+            
+            // Med manifest.api frågar sidan frågeservern i stället för att ladda alla
+            // dokument; docs håller då bara de hämtade sidorna av aktuellt resultat.
+            const queryApi = manifest.api || null;
+            const API_PAGE_SIZE = 100;
+            let apiRequest = null;
+            
+            // Initial visning: ladda de nyaste filerna och visa dem direkt
+            window.onload = function() {
+                if (queryApi) {
+                    filterDocuments();
+                } else {
+                    loadShardsUntil(manifest.initialDocuments);
+                }
+            };
+            
+            function clearDocs() {
+                for (const column of ['type', 'id', 'title', 'summary', 'published', 'url', 'senders', 'categories']) {
+                    docs[column] = [];
+                }
+                docs.senderStart = [0];
+                docs.categoryStart = [0];
+                docs.length = 0;
+            }
+            
+            function appendShard(shard) {
+                const n = shard.id.length;
+                for (let i = 0; i < n; i++) {
+                    docs.type.push(shard.type[i]);
+                    docs.id.push(shard.id[i]);
+                    docs.title.push(shard.title[i]);
+                    docs.summary.push(shard.summary[i]);
+                    docs.published.push(shard.published[i]);
+                    docs.url.push(shard.url[i]);
+                }
+                let s = 0, c = 0;
+                for (let i = 0; i < n; i++) {
+                    for (let k = 0; k < shard.senderCount[i]; k++) docs.senders.push(shard.senders[s++]);
+                    docs.senderStart.push(docs.senders.length);
+                    for (let k = 0; k < shard.categoryCount[i]; k++) docs.categories.push(shard.categories[c++]);
+                    docs.categoryStart.push(docs.categories.length);
+                }
+                docs.length += n;
+            }
+            
+            // Ladda fler filer i tur och ordning tills minst minDocuments är laddade.
+            // Filerna hämtas parallellt men läggs till i manifestets ordning.
+            function loadShardsUntil(minDocuments) {
+                if (loadingShards) return loadingShards;
+                
+                const shards = [];
+                let count = docs.length;
+                for (let i = loadedShards; i < manifest.shards.length && count < minDocuments; i++) {
+                    shards.push(manifest.shards[i]);
+                    count += manifest.shards[i].count;
+                }
+                if (shards.length === 0) return Promise.resolve();
+                
+                updateLoadStatus(true);
+                loadingShards = Promise.all(shards.map(shard => fetchJson(shard.file))).then(results => {
+                    results.forEach(appendShard);
+                    loadedShards += shards.length;
+                }).catch(error => {
+                    document.getElementById('loadStatus').textContent = `Kunde inte ladda dokument: ${error.message}`;
+                    throw error;
+                }).finally(() => {
+                    loadingShards = null;
+                    updateLoadStatus(false);
+                    // Träffarna gäller redan alla dokument; visa bara fler av dem
+                    if (currentResult) {
+                        applyResult(true);
+                    } else {
+                        filterDocuments(true);
+                    }
+                });
+                return loadingShards;
+            }
+            
+            function loadOlderDocuments() {
+                if (queryApi) {
+                    loadResultPage(currentResult.query, docs.length);
+                    return;
+                }
+                const next = manifest.shards[loadedShards];
+                if (next) loadShardsUntil(docs.length + next.count);
+            }
+            
+            function loadAllDocuments() {
+                loadShardsUntil(Infinity);
+            }
+            
+            function updateLoadStatus(loading) {
+                const status = document.getElementById('loadStatus');
+                if (loading) {
+                    status.textContent = 'Laddar dokument...';
+                    return;
+                }
+                if (loadedShards >= manifest.shards.length) {
+                    status.innerHTML = '';
+                    return;
+                }
+                const next = manifest.shards[loadedShards];
+                const remaining = manifest.total - docs.length;
+                const label = next.key === 'undated' ? 'utan datum' : `från ${next.key.slice(0, 4)}`;
+                status.innerHTML = `${remaining} äldre dokument är inte laddade. ` +
+                    `<button onclick="loadOlderDocuments()">Ladda dokument ${label}</button>` +
+                    `<button onclick="loadAllDocuments()">Ladda alla</button>`;
+            }
+            
+            // Datum lagras som heltal ÅÅÅÅMMDD (0 = okänt)
+            function formatDate(date) {
+                if (!date) return '';
+                const s = String(date);
+                return `${s.slice(0, 4)}-${s.slice(4, 6)}-${s.slice(6, 8)}`;
+            }
+            
+            function senderNames(i) {
+                const names = [];
+                for (let k = docs.senderStart[i]; k < docs.senderStart[i + 1]; k++) {
+                    const s = docs.senders[k];
+                    names.push(allCodes[s] || `Okänt (${s})`);
+                }
+                return names.join(', ');
+            }
+            
+            function categoryNames(i) {
+                const names = [];
+                for (let k = docs.categoryStart[i]; k < docs.categoryStart[i + 1]; k++) {
+                    const c = docs.categories[k];
+                    names.push(allCodes[c] || `Okänd (${c})`);
+                }
+                return names.join(', ');
+            }
+            
+            function fetchJson(file, options) {
+                return fetch(file, options).then(response => {
+                    if (!response.ok) throw new Error(`${file}: ${response.status}`);
+                    return response.json();
+                });
+            }
+            
+            // Frågemotorn körs i en Web Worker så att sidan inte fryser under tunga
+            // sökningar. Sidan skickar filterläget och får tillbaka träffarnas
+            // dokumentnummer (bit i = dokument i i laddningsordning) och antal.
+            const queryWorker = queryApi ? null : new Worker(manifest.worker);
+            if (queryWorker) {
+                queryWorker.onmessage = event => handleWorkerMessage(event.data);
+                queryWorker.postMessage({ type: 'init', manifest, base: document.baseURI });
+            }
+            let queryId = 0;
+            let queryKeepScroll = false;
+            let currentResult = null;
+            let exportId = 0;
+            let filterTimer = null;
+            
+            function selectedFilters() {
+                return {
+                    search: document.getElementById('searchBox').value,
+                    types: Array.from(document.querySelectorAll('.doctype-filter:checked')).map(cb => typeIndex.get(cb.value)),
+                    depts: Array.from(document.querySelectorAll('.dept-filter:checked')).map(cb => cb.value),
+                    cats: Array.from(document.querySelectorAll('.cat-filter:checked')).map(cb => cb.value),
+                    from: monthValue('dateFrom'),
+                    to: monthValue('dateTo')
+                };
+            }
+            
+            // Månadsfältets värde ('ÅÅÅÅ-MM') som heltal ÅÅÅÅMM, 0 om det är tomt
+            function monthValue(id) {
+                return Number(document.getElementById(id).value.replace('-', '')) || 0;
+            }
+            
+            function handleWorkerMessage(message) {
+                if (message.type === 'export') {
+                    if (message.id === exportId) downloadBlob(message.blob, message.format);
+                    return;
+                }
+                if (message.type === 'exportError') {
+                    alert(`Exporten misslyckades: ${message.message}`);
+                    return;
+                }
+                // Svar på frågor som redan ersatts av en nyare ignoreras
+                if (message.id !== queryId) return;
+                if (message.type === 'error') {
+                    document.getElementById('resultCount').textContent = `Sökningen misslyckades: ${message.message}`;
+                    return;
+                }
+                currentResult = message;
+                applyResult(queryKeepScroll);
+            }
+            
+            // Antal träffar per kryssruta om den valdes, givet övriga filter
+            function updateFacetCounts(counts) {
+                const show = (selector, count) => document.querySelectorAll(selector).forEach(cb => {
+                    const n = count(cb.value);
+                    const label = cb.parentElement.querySelector('.facet-count');
+                    label.textContent = `(${n})`;
+                    label.classList.toggle('facet-empty', n === 0 && !cb.checked);
+                });
+                show('.doctype-filter', type => counts.types[typeIndex.get(type)]);
+                show('.dept-filter', dept => counts.senders[dept] || 0);
+                show('.cat-filter', cat => counts.categories[cat] || 0);
+            }
+            
+            function apiUrl(endpoint, query, extra = {}) {
+                const params = new URLSearchParams({
+                    q: query.search,
+                    type: query.types.join(','),
+                    dept: query.depts.join(','),
+                    cat: query.cats.join(','),
+                    from: query.from || '',
+                    to: query.to || '',
+                    ...extra
+                });
+                return `${queryApi}/${endpoint}?${params}`;
+            }
+            
+            // Hämta en sida av träffarna från frågeservern; offset 0 är en ny fråga.
+            // En pågående hämtning avbryts, så bara den senaste frågan visas.
+            function loadResultPage(query, offset) {
+                if (apiRequest) apiRequest.abort();
+                const controller = new AbortController();
+                apiRequest = controller;
+                loadingShards = fetchJson(apiUrl('query', query, { offset, limit: API_PAGE_SIZE }), {
+                    signal: controller.signal
+                }).then(page => {
+                    if (offset === 0) clearDocs();
+                    appendShard(page.documents);
+                    currentResult = {
+                        query, total: page.total, typeCounts: page.typeCounts,
+                        facetCounts: page.facetCounts, histogram: page.histogram
+                    };
+                    applyResult(offset > 0);
+                }).catch(error => {
+                    if (error.name !== 'AbortError') {
+                        document.getElementById('resultCount').textContent = `Sökningen misslyckades: ${error.message}`;
+                    }
+                }).finally(() => {
+                    if (apiRequest === controller) {
+                        apiRequest = null;
+                        loadingShards = null;
+                    }
+                });
+            }
+            
+            // Vänta tills användaren slutat skriva innan sökningen körs
+            function scheduleFilter() {
+                clearTimeout(filterTimer);
+                filterTimer = setTimeout(filterDocuments, 200);
+            }
+            
+            // keepScroll: samma filter men fler laddade dokument, behåll scrollpositionen
+            function filterDocuments(keepScroll = false) {
+                clearTimeout(filterTimer);
+                if (queryApi) {
+                    loadResultPage(selectedFilters(), 0);
+                    return;
+                }
+                queryKeepScroll = keepScroll;
+                queryWorker.postMessage({ type: 'query', id: ++queryId, ...selectedFilters() });
+            }
+            
+            function applyResult(keepScroll) {
+                const { typeCounts, facetCounts } = currentResult;
+                const resultCount = document.getElementById('resultCount');
+                
+                if (queryApi) {
+                    // docs håller redan bara träffarna, i serverns ordning
+                    currentFilteredDocuments = Array.from({ length: docs.length }, (_, i) => i);
+                    currentTotalMatches = currentResult.total;
+                    resultCount.textContent = `Visar ${docs.length} av ${currentTotalMatches} träffar bland ${manifest.total} dokument`;
+                } else {
+                    // Träffar bland de laddade dokumenten, i datumordning
+                    const positions = currentResult.positions;
+                    let loaded = 0, end = positions.length;
+                    while (loaded < end) {
+                        const middle = (loaded + end) >>> 1;
+                        if (positions[middle] < docs.length) loaded = middle + 1; else end = middle;
+                    }
+                    currentFilteredDocuments = positions.subarray(0, loaded);
+                    currentTotalMatches = positions.length;
+                    resultCount.textContent =
+                        `Visar ${currentFilteredDocuments.length} av ${docs.length} dokument` +
+                        (docs.length < manifest.total ? ` (${currentTotalMatches} träffar bland alla ${manifest.total})` : '');
+                }
+                
+                // Visa dokument
+                showResults(keepScroll);
+                
+                // Uppdatera statistik, antalen och histogrammet vid varje filter
+                updateStatistics(currentTotalMatches, typeCounts);
+                updateFacetCounts(facetCounts);
+                updateTimeline(currentResult.histogram, currentResult.query);
+            }
+            
+            function formatMonth(month) {
+                const s = String(month);
+                return `${s.slice(0, 4)}-${s.slice(4, 6)}`;
+            }
+            
+            // Histogram per månad för alla filter utom datumintervallet, från äldsta till
+            // nyaste månad. Månader inom intervallet markeras; ett klick väljer månaden.
+            function updateTimeline(histogram, query) {
+                const counts = new Map(histogram.filter(([month]) => month > 0));
+                const container = document.getElementById('histogram');
+                if (counts.size === 0) {
+                    container.innerHTML = '';
+                    return;
+                }
+                const months = [...counts.keys()];
+                const first = Math.min(...months), last = Math.max(...months);
+                const max = Math.max(1, ...counts.values());
+                const bars = [];
+                for (let month = first; month <= last; month = month % 100 === 12 ? month + 89 : month + 1) {
+                    const n = counts.get(month) || 0;
+                    const inside = (!query.from || month >= query.from) && (!query.to || month <= query.to);
+                    bars.push(`<div class="histogram-month" title="${formatMonth(month)}: ${n} dokument" onclick="selectMonth(${month})">` +
+                        `<div class="histogram-bar${inside ? '' : ' outside'}" style="height: ${n ? Math.max(2, 100 * n / max) : 0}%"></div></div>`);
+                }
+                container.innerHTML = bars.join('');
+                document.getElementById('histogramStart').textContent = formatMonth(first);
+                document.getElementById('histogramEnd').textContent = formatMonth(last);
+            }
+            
+            // Klick på en månad väljer bara den månaden; ett nytt klick visar alla datum igen
+            function selectMonth(month) {
+                const from = document.getElementById('dateFrom');
+                const to = document.getElementById('dateTo');
+                const value = formatMonth(month);
+                const selected = from.value === value && to.value === value;
+                from.value = selected ? '' : value;
+                to.value = selected ? '' : value;
+                filterDocuments();
+            }
+            
+            function clearDateRange() {
+                document.getElementById('dateFrom').value = '';
+                document.getElementById('dateTo').value = '';
+                filterDocuments();
+            }
+            
+            // Virtualiserad resultatlista: alla träffar går att scrolla igenom, men bara
+            // de synliga raderna finns i DOM. Raderna har fast höjd och återanvänds.
+            const ROW_HEIGHT = """ + str(ROW_HEIGHT) + """;
+            const OVERSCAN_ROWS = 5;
+            const resultList = { viewport: null, spacer: null, empty: null, rows: [], queued: false };
+            
+            function initResultList() {
+                const viewport = document.getElementById('document-list');
+                viewport.innerHTML = '';
+                resultList.viewport = viewport;
+                resultList.spacer = document.createElement('div');
+                viewport.appendChild(resultList.spacer);
+                resultList.empty = document.createElement('p');
+                resultList.empty.className = 'list-empty';
+                resultList.empty.textContent = 'Inga dokument matchar de valda filtren.';
+                resultList.empty.style.display = 'none';
+                viewport.appendChild(resultList.empty);
+                viewport.addEventListener('scroll', scheduleRender);
+                window.addEventListener('resize', scheduleRender);
+            }
+            
+            // Nytt resultat: bara höjden och de synliga raderna uppdateras
+            function showResults(keepScroll) {
+                if (!resultList.viewport) initResultList();
+                const count = currentFilteredDocuments.length;
+                resultList.spacer.style.height = `${count * ROW_HEIGHT}px`;
+                resultList.empty.style.display = count === 0 ? '' : 'none';
+                if (!keepScroll) resultList.viewport.scrollTop = 0;
+                renderVisibleRows();
+            }
+            
+            function scheduleRender() {
+                if (resultList.queued) return;
+                resultList.queued = true;
+                requestAnimationFrame(() => {
+                    resultList.queued = false;
+                    renderVisibleRows();
+                });
+            }
+            
+            function renderVisibleRows() {
+                const { viewport, rows } = resultList;
+                const count = currentFilteredDocuments.length;
+                const visible = Math.ceil(viewport.clientHeight / ROW_HEIGHT) + 2 * OVERSCAN_ROWS;
+                const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN_ROWS);
+                const last = Math.min(count, first + visible);
+                
+                // Fler rader behövs bara om fönstret blivit högre
+                while (rows.length < visible) {
+                    const element = document.createElement('div');
+                    element.className = 'document-item';
+                    viewport.appendChild(element);
+                    rows.push({ element, position: -1, doc: -1 });
+                }
+                
+                // Position p visas alltid i rad p % rows.length, så vid scroll
+                // behöver bara de rader som kommer in i fönstret ritas om
+                rows.forEach(row => {
+                    if (row.position < first || row.position >= last) {
+                        row.position = -1;
+                        row.element.style.display = 'none';
+                    }
+                });
+                for (let position = first; position < last; position++) {
+                    const row = rows[position % rows.length];
+                    const i = currentFilteredDocuments[position];
+                    if (row.position !== position) {
+                        row.position = position;
+                        row.element.style.transform = `translateY(${position * ROW_HEIGHT}px)`;
+                        row.element.style.display = '';
+                    }
+                    if (row.doc !== i) {
+                        row.doc = i;
+                        row.element.innerHTML = renderDocument(i);
+                    }
+                }
+                
+                // Nära slutet av listan: ladda äldre dokument om det finns fler träffar bland dem
+                if (last >= count - OVERSCAN_ROWS && currentTotalMatches > count && !loadingShards) {
+                    loadOlderDocuments();
+                }
+            }
+            
+            function renderDocument(i) {
+                const type = manifest.types[docs.type[i]];
+                const deptNames = senderNames(i);
+                const catNames = categoryNames(i);
+                
+                return `
+                    <div class="document-title" title="${escapeAttribute(docs.title[i])}">
+                        <span class="doc-type-badge ${badgeClasses[docs.type[i]]}">${type}</span>
+                        ${docs.title[i] || 'Ingen titel'}
+                    </div>
+                    <div class="document-meta">
+                        <strong>ID:</strong> ${docs.id[i] || 'Inget ID'} | 
+                        <strong>Publicerad:</strong> ${formatDate(docs.published[i]) || 'Okänt datum'}
+                        ${deptNames ? ` | <strong>Departement:</strong> ${deptNames}` : ''}
+                        ${catNames ? ` | <strong>Kategorier:</strong> ${catNames}` : ''}
+                    </div>
+                    ${docs.summary[i] ? `<div class="document-summary">${docs.summary[i]}</div>` : ''}
+                    ${docs.url[i] ? `<div class="document-link"><a href="https://www.regeringen.se${docs.url[i]}" target="_blank">Läs mer →</a></div>` : ''}
+                `;
+            }
+            
+            function escapeAttribute(text) {
+                return text.replace(/&/g, '&amp;').replace(/"/g, '&quot;').replace(/</g, '&lt;');
+            }
+            
+            // Statistiken kommer från frågemotorn och gäller alla dokument, även ej laddade
+            function updateStatistics(totalMatches, typeCounts) {
+                const [kdCount, dsCount, souCount, ruCount, rapCount] = typeCounts;
+                
+                document.getElementById('stats').innerHTML = `
+                    <div class="stat-box">
+                        <div class="stat-number">${totalMatches}</div>
+                        <div class="stat-label">Filtrerade</div>
+                    </div>
+                    <div class="stat-box">
+                        <div class="stat-number">${kdCount}</div>
+                        <div class="stat-label">Kommittédirektiv</div>
+                    </div>
+                    <div class="stat-box">
+                        <div class="stat-number">${dsCount}</div>
+                        <div class="stat-label">Ds/PM</div>
+                    </div>
+                    <div class="stat-box">
+                        <div class="stat-number">${souCount}</div>
+                        <div class="stat-label">SOU</div>
+                    </div>
+                    <div class="stat-box">
+                        <div class="stat-number">${ruCount}</div>
+                        <div class="stat-label">Regeringsuppdrag</div>
+                    </div>
+                    <div class="stat-box">
+                        <div class="stat-number">${rapCount}</div>
+                        <div class="stat-label">Rapporter</div>
+                    </div>
+                `;
+            }
+            
+            function clearAllFilters() {
+                document.querySelectorAll('input[type="checkbox"]').forEach(cb => cb.checked = false);
+                document.getElementById('searchBox').value = '';
+                document.getElementById('dateFrom').value = '';
+                document.getElementById('dateTo').value = '';
+                // Behåll dokumenttyper markerade
+                document.querySelectorAll('.doctype-filter').forEach(cb => cb.checked = true);
+                filterDocuments();
+            }
+            
+            function selectAllDocTypes() {
+                document.querySelectorAll('.doctype-filter').forEach(cb => cb.checked = true);
+                filterDocuments();
+            }
+            
+            function selectAllDepartments() {
+                document.querySelectorAll('.dept-filter').forEach(cb => cb.checked = true);
+                filterDocuments();
+            }
+            
+            function selectAllCategories() {
+                document.querySelectorAll('.cat-filter').forEach(cb => cb.checked = true);
+                filterDocuments();
+            }
+            
+            // Exporten (CSV eller JSONL) byggs av frågemotorn (eller frågeservern)
+            // och omfattar alla träffar, även ej laddade
+            function exportResults(format = 'csv') {
+                if (!currentResult || currentTotalMatches === 0) {
+                    alert('Inga dokument att exportera!');
+                    return;
+                }
+                if (queryApi) {
+                    downloadUrl(apiUrl('export', currentResult.query, { format }), format);
+                    return;
+                }
+                queryWorker.postMessage({ ...currentResult.query, type: 'export', format, id: ++exportId });
+            }
+            
+            function downloadBlob(blob, format) {
+                const url = URL.createObjectURL(blob);
+                downloadUrl(url, format);
+                // Släpp blobben när nedladdningen har startat
+                setTimeout(() => URL.revokeObjectURL(url), 60000);
+            }
+            
+            function downloadUrl(url, format) {
+                // Skapa och ladda ner fil
+                const link = document.createElement('a');
+                link.setAttribute('href', url);
+                link.setAttribute('download', `regeringsdokument_${new Date().toISOString().slice(0,10)}.${format}`);
+                link.style.visibility = 'hidden';
+                document.body.appendChild(link);
+                link.click();
+                document.body.removeChild(link);
+            }
+            
+            // Lägg till kortkommandon
+            document.addEventListener('keydown', function(e) {
+                // Ctrl/Cmd + K för att fokusera på sökrutan
+                if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
+                    e.preventDefault();
+                    document.getElementById('searchBox').focus();
+                }
+                // Escape för att rensa sökning
+                if (e.key === 'Escape') {
+                    document.getElementById('searchBox').value = '';
+                    filterDocuments();
+                }
+            });
+    """
+
+def render_worker_script():
+    """Returnera frågemotorn som körs i sidans Web Worker"""
+    return """
+            // Frågemotor för dashboarden. Den äger sökindex, facetter och kub, och
+            // dokumenten när något exporteras. Sidan skickar filterläget och får
+            // tillbaka träffarnas dokumentnummer och antal; en fråga som ersatts
+            // av en nyare avbryts vid nästa väntepunkt.
+            let manifest = null;
+            let base = null;
+            let ready = null;
+            let latestQuery = 0;
+            
+            self.onmessage = event => {
+                const message = event.data;
+                if (message.type === 'init') {
+                    init(message.manifest, message.base);
+                } else if (message.type === 'query') {
+                    latestQuery = message.id;
+                    runQuery(message).catch(error =>
+                        postMessage({ type: 'error', id: message.id, message: error.message }));
+                } else if (message.type === 'export') {
+                    exportDocuments(message).catch(error =>
+                        postMessage({ type: 'exportError', id: message.id, message: error.message }));
+                }
+            };
+            
+            function init(data, pageUrl) {
+                manifest = data;
+                base = pageUrl;
+                bitsetWords = Math.ceil(manifest.total / 32);
+                shardStarts = [];
+                let start = 0;
+                for (const shard of manifest.shards) {
+                    shardStarts.push(start);
+                    start += shard.count;
+                }
+                foldMap = manifest.search.fold;
+                foldPattern = new RegExp('[' + Object.keys(foldMap).join('') + ']', 'g');
+                ready = Promise.all([
+                    Promise.all(manifest.facets.map(fetchJson)).then(data => { facets = data; }),
+                    fetchJson(manifest.cube).then(data => { cube = data; })
+                ]);
+            }
+            
+            // Sökvägarna i manifestet är relativa till sidan, inte till workern
+            function fetchJson(file) {
+                return fetch(new URL(file, base)).then(response => {
+                    if (!response.ok) throw new Error(`${file}: ${response.status}`);
+                    return response.json();
+                });
+            }
+            
+            // Ge nyare meddelanden en chans att komma fram innan tungt arbete
+            function yieldToMessages() {
+                return new Promise(resolve => setTimeout(resolve, 0));
+            }
+            
+            async function runQuery(query) {
+                const isCurrent = () => query.id === latestQuery;
+                const matches = await searchDocuments(query.search, isCurrent);
+                await ready;
+                await yieldToMessages();
+                if (!isCurrent()) return;
+                
+                // Histogrammet visar alla månader för övriga filter; datumintervallet
+                // (ett sammanhängande intervall av dokumentnummer) maskas in efteråt
+                const range = monthRange(query.from, query.to);
+                const withoutRange = filterBitset(query.types, query.depts, query.cats, matches);
+                const result = range ? keepRange(withoutRange.slice(), range) : withoutRange;
+                const positions = bitPositions(result);
+                const exact = cubeAnswers(matches, query.depts, query.cats, range);
+                const typeCounts = manifest.types.map((_, t) => !query.types.includes(t) ? 0 :
+                    exact ? cubeCount([t], query.depts[0] || '', query.cats[0] || '') :
+                    bitCount(result, facetBitset('types', t)));
+                
+                postMessage({
+                    type: 'result',
+                    id: query.id,
+                    query,
+                    positions,
+                    typeCounts,
+                    facetCounts: facetCounts(matches, query.types, query.depts, query.cats, range),
+                    histogram: histogram(withoutRange)
+                }, [positions.buffer]);
+            }
+            
+            // Sökindex per datafil: ordlistorna och postningsblocken laddas först vid sökning
+            let foldMap = {};
+            let foldPattern = null;
+            const searchWords = new Map();
+            const searchBlocks = new Map();
+            const matchingWordsCache = new Map();
+            
+            // Samma vikning som i Python: gemener, inga accenter men å, ä och ö behålls
+            function fold(text) {
+                return text.normalize('NFC').toLocaleLowerCase('sv').replace(foldPattern, ch => foldMap[ch]);
+            }
+            
+            function tokenize(text) {
+                return fold(text).match(/[\\p{L}\\p{N}_]+/gu) || [];
+            }
+            
+            // Hämta en fil en gång; misslyckas hämtningen försöks den igen nästa gång
+            function loadOnce(cache, key, file) {
+                if (!cache.has(key)) {
+                    cache.set(key, fetchJson(file).catch(error => {
+                        cache.delete(key);
+                        throw error;
+                    }));
+                }
+                return cache.get(key);
+            }
+            
+            function loadSearchWords(shard) {
+                return loadOnce(searchWords, shard, manifest.search.shards[shard].words);
+            }
+            
+            function loadSearchBlock(shard, block) {
+                return loadOnce(searchBlocks, shard + ':' + block, manifest.search.shards[shard].blocks[block]);
+            }
+            
+            // Nummer på alla ord i datafilens ordlista som innehåller sökordet (så att
+            // "skatt" även hittar "inkomstskatt")
+            function matchingWords(shard, words, queryWord) {
+                const cacheKey = shard + ':' + queryWord;
+                let ids = matchingWordsCache.get(cacheKey);
+                if (!ids) {
+                    ids = [];
+                    for (let k = 0; k < words.length; k++) {
+                        if (words[k].includes(queryWord)) ids.push(k);
+                    }
+                    matchingWordsCache.set(cacheKey, ids);
+                }
+                return ids;
+            }
+            
+            // Sätt bitarna för sökordets träffar i en datafil; positionerna i
+            // postningslistorna räknas från datafilens första dokument
+            async function searchShard(shard, queryWord, found) {
+                const ids = matchingWords(shard, await loadSearchWords(shard), queryWord);
+                const blockSize = manifest.search.blockSize;
+                const blockIds = [...new Set(ids.map(id => Math.floor(id / blockSize)))];
+                const blocks = new Map(await Promise.all(blockIds.map(block =>
+                    loadSearchBlock(shard, block).then(postings => [block, postings]))));
+                for (const id of ids) {
+                    const postings = blocks.get(Math.floor(id / blockSize))[id % blockSize];
+                    let position = shardStarts[shard];
+                    for (let k = 0; k < postings.length; k++) {
+                        position += postings[k];
+                        found[position >>> 5] |= 1 << (position & 31);
+                    }
+                }
+            }
+            
+            // Dokumentnummer som innehåller alla sökord som bitmängd, null om ingen
+            // sökning. Avbryts (null) när isCurrent() inte längre gäller.
+            async function searchDocuments(searchTerm, isCurrent) {
+                const queryWords = [...new Set(tokenize(searchTerm))];
+                if (queryWords.length === 0) return null;
+                
+                let result = null;
+                for (const queryWord of queryWords) {
+                    const found = new Uint32Array(bitsetWords);
+                    await Promise.all(manifest.search.shards.map((_, shard) => searchShard(shard, queryWord, found)));
+                    if (!isCurrent()) return null;
+                    if (result === null) {
+                        result = found;
+                    } else {
+                        andInto(result, found);
+                    }
+                    if (bitCount(result) === 0) break;
+                }
+                return result;
+            }
+            
+            // Filter som bitmängder över alla dokument (bit i = dokument i i laddningsordning).
+            // Dokumenten är redan sorterade på datum, så ingen sortering behövs.
+            let bitsetWords = 0;
+            // Datafilernas första dokumentnummer; facetterna och sökindexet har positioner per datafil
+            let shardStarts = [];
+            let facets = null;
+            const facetBits = new Map();
+            
+            // Aggregeringskuben från bygget: antal per [typ][departement][kategori], '' = alla
+            let cube = null;
+            
+            // Sätt en datafils postningar i bits, förskjutna till datafilens första dokumentnummer
+            function decodePostings(postings, bits, start) {
+                const set = position => { bits[position >>> 5] |= 1 << (position & 31); };
+                if (postings.bits) {
+                    const bytes = atob(postings.bits);
+                    for (let k = 0; k < bytes.length; k++) {
+                        const byte = bytes.charCodeAt(k);
+                        for (let bit = 0; byte >> bit; bit++) {
+                            if (byte >> bit & 1) set(start + k * 8 + bit);
+                        }
+                    }
+                } else {
+                    let position = start;
+                    for (const delta of postings.deltas) {
+                        position += delta;
+                        set(position);
+                    }
+                }
+            }
+            
+            function facetBitset(group, key) {
+                const cacheKey = group + ':' + key;
+                if (!facetBits.has(cacheKey)) {
+                    const bits = new Uint32Array(bitsetWords);
+                    facets.forEach((shardFacets, shard) => {
+                        const postings = shardFacets[group][key];
+                        if (postings) decodePostings(postings, bits, shardStarts[shard]);
+                    });
+                    facetBits.set(cacheKey, bits);
+                }
+                return facetBits.get(cacheKey);
+            }
+            
+            function unionOf(group, keys) {
+                const result = new Uint32Array(bitsetWords);
+                keys.forEach(key => {
+                    const bits = facetBitset(group, key);
+                    for (let k = 0; k < bitsetWords; k++) result[k] |= bits[k];
+                });
+                return result;
+            }
+            
+            function andInto(target, bits) {
+                for (let k = 0; k < target.length; k++) target[k] &= bits[k];
+            }
+            
+            function popcount(x) {
+                x = x - ((x >>> 1) & 0x55555555);
+                x = (x & 0x33333333) + ((x >>> 2) & 0x33333333);
+                return (((x + (x >>> 4)) & 0x0F0F0F0F) * 0x01010101) >>> 24;
+            }
+            
+            function bitCount(bits, mask) {
+                let count = 0;
+                for (let k = 0; k < bits.length; k++) count += popcount(mask ? bits[k] & mask[k] : bits[k]);
+                return count;
+            }
+            
+            // Satta bitar som sorterade dokumentnummer
+            function bitPositions(bits) {
+                const positions = new Uint32Array(bitCount(bits));
+                let n = 0;
+                for (let k = 0; k < bits.length; k++) {
+                    let word = bits[k];
+                    while (word !== 0) {
+                        positions[n++] = k * 32 + (31 - Math.clz32(word & -word));
+                        word &= word - 1;
+                    }
+                }
+                return positions;
+            }
+            
+            function cubeCount(types, dept, cat) {
+                let count = 0;
+                for (const t of types) count += (cube[t][dept] || {})[cat] || 0;
+                return count;
+            }
+            
+            // Träffar för valda typer, departement och kategorier samt sökträffar (null = alla)
+            // och datumintervall (null = alla datum)
+            function filterBitset(types, depts, cats, matches, range) {
+                const result = unionOf('types', types);
+                if (depts.length > 0) andInto(result, unionOf('senders', depts));
+                if (cats.length > 0) andInto(result, unionOf('categories', cats));
+                if (matches) andInto(result, matches);
+                if (range) keepRange(result, range);
+                return result;
+            }
+            
+            // Kuben ger exakta antal så länge ingen sökterm eller datumintervall finns och
+            // högst ett departement och en kategori är valda; annars räknas de med bitmängderna
+            function cubeAnswers(matches, depts, cats, range) {
+                return !matches && !range && depts.length <= 1 && cats.length <= 1;
+            }
+            
+            // Tidslinjen från bygget: [[ÅÅÅÅMM, första dokumentnummer]], nyaste först och
+            // odaterade (månad 0) sist. Varje månad slutar där nästa börjar.
+            function monthStart(i) {
+                return i < manifest.timeline.length ? manifest.timeline[i][1] : manifest.total;
+            }
+            
+            // Dokumentnummer [start, end) för månaderna from..to (ÅÅÅÅMM, 0 = öppen gräns),
+            // binärsökta i tidslinjen; null om inget datumintervall är valt
+            function monthRange(from, to) {
+                if (!from && !to) return null;
+                const firstMonth = predicate => {
+                    let low = 0, high = manifest.timeline.length;
+                    while (low < high) {
+                        const middle = (low + high) >>> 1;
+                        if (predicate(manifest.timeline[middle][0])) high = middle; else low = middle + 1;
+                    }
+                    return low;
+                };
+                const start = monthStart(firstMonth(month => month <= (to || 999999)));
+                const end = monthStart(firstMonth(month => month < (from || 1)));
+                return [start, Math.max(start, end)];
+            }
+            
+            // Ord k i en bitmängd, maskat till dokumentnummer i [start, end)
+            function wordMask(k, start, end) {
+                const low = k * 32;
+                let mask = ~0;
+                if (start > low) mask &= ~0 << (start - low);
+                if (end < low + 32) mask &= ~(~0 << (end - low));
+                return mask;
+            }
+            
+            function keepRange(bits, [start, end]) {
+                const first = start >>> 5, last = (end - 1) >>> 5;
+                for (let k = 0; k < bits.length; k++) {
+                    bits[k] = start < end && k >= first && k <= last ? bits[k] & wordMask(k, start, end) : 0;
+                }
+                return bits;
+            }
+            
+            function rangeCount(bits, start, end) {
+                let count = 0;
+                if (start >= end) return count;
+                for (let k = start >>> 5; k <= (end - 1) >>> 5; k++) count += popcount(bits[k] & wordMask(k, start, end));
+                return count;
+            }
+            
+            // Antal träffar per månad: [[ÅÅÅÅMM, antal]] i tidslinjens ordning
+            function histogram(bits) {
+                return manifest.timeline.map(([month, start], i) => [month, rangeCount(bits, start, monthStart(i + 1))]);
+            }
+            
+            // Antal träffar per kryssruta om den valdes, givet övriga filter
+            function facetCounts(matches, types, depts, cats, range) {
+                const allTypes = manifest.types.map((_, t) => t);
+                let typeCount, deptCount, catCount;
+                if (cubeAnswers(matches, depts, cats, range)) {
+                    const dept = depts[0] || '';
+                    const cat = cats[0] || '';
+                    typeCount = t => cubeCount([t], dept, cat);
+                    deptCount = d => cubeCount(types, d, cat);
+                    catCount = c => cubeCount(types, dept, c);
+                } else {
+                    const withoutTypes = filterBitset(allTypes, depts, cats, matches, range);
+                    const withoutDepts = filterBitset(types, [], cats, matches, range);
+                    const withoutCats = filterBitset(types, depts, [], matches, range);
+                    typeCount = t => bitCount(withoutTypes, facetBitset('types', t));
+                    deptCount = d => bitCount(withoutDepts, facetBitset('senders', d));
+                    catCount = c => bitCount(withoutCats, facetBitset('categories', c));
+                }
+                
+                // Nycklarna är alla som förekommer i någon datafil
+                const byKey = (group, count) => Object.fromEntries(
+                    [...new Set(facets.flatMap(shardFacets => Object.keys(shardFacets[group])))].map(key => [key, count(key)]));
+                return {
+                    types: allTypes.map(typeCount),
+                    senders: byKey('senders', deptCount),
+                    categories: byKey('categories', catCount)
+                };
+            }
+            
+            // Datafilerna laddas bara vid export, och då bara de som har träffar
+            const shards = new Map();
+            
+            function loadShard(index) {
+                if (!shards.has(index)) {
+                    shards.set(index, fetchJson(manifest.shards[index].file).then(shard => {
+                        // Startposition per dokument i de platta avsändar- och kategorilistorna
+                        shard.senderStart = [0];
+                        shard.categoryStart = [0];
+                        for (let i = 0; i < shard.id.length; i++) {
+                            shard.senderStart.push(shard.senderStart[i] + shard.senderCount[i]);
+                            shard.categoryStart.push(shard.categoryStart[i] + shard.categoryCount[i]);
+                        }
+                        return shard;
+                    }).catch(error => {
+                        shards.delete(index);
+                        throw error;
+                    }));
+                }
+                return shards.get(index);
+            }
+            
+            // Datum lagras som heltal ÅÅÅÅMMDD (0 = okänt)
+            function formatDate(date) {
+                if (!date) return '';
+                const s = String(date);
+                return `${s.slice(0, 4)}-${s.slice(4, 6)}-${s.slice(6, 8)}`;
+            }
+            
+            // Namnen på ett dokuments avsändare och kategorier, uppslagna en gång per
+            // datafil och kodlista och sedan återanvända i varje export
+            function nameColumns(shard) {
+                if (!shard.senderNames) {
+                    const column = (codes, starts, unknown) => {
+                        const lists = new Map();
+                        const names = [];
+                        for (let i = 0; i < shard.id.length; i++) {
+                            const list = codes.slice(starts[i], starts[i + 1]);
+                            const key = list.join(',');
+                            if (!lists.has(key)) {
+                                lists.set(key, list.map(code => manifest.codes[code] || `${unknown} (${code})`));
+                            }
+                            names.push(lists.get(key));
+                        }
+                        return names;
+                    };
+                    shard.senderNames = column(shard.senders, shard.senderStart, 'Okänt');
+                    shard.categoryNames = column(shard.categories, shard.categoryStart, 'Okänd');
+                }
+                return shard;
+            }
+            
+            function quoted(text) {
+                return `"${text.replace(/"/g, '""')}"`;
+            }
+            
+            function csvRow(shard, i) {
+                return [
+                    manifest.types[shard.type[i]],
+                    shard.id[i],
+                    quoted(shard.title[i]),
+                    formatDate(shard.published[i]),
+                    quoted(shard.senderNames[i].join(', ')),
+                    quoted(shard.categoryNames[i].join(', ')),
+                    shard.url[i] ? `https://www.regeringen.se${shard.url[i]}` : ''
+                ].join(';') + '\\n';
+            }
+            
+            function jsonlRow(shard, i) {
+                return JSON.stringify({
+                    type: manifest.types[shard.type[i]],
+                    id: shard.id[i],
+                    title: shard.title[i],
+                    summary: shard.summary[i],
+                    published: formatDate(shard.published[i]),
+                    departments: shard.senderNames[i],
+                    categories: shard.categoryNames[i],
+                    url: shard.url[i] ? `https://www.regeringen.se${shard.url[i]}` : ''
+                }) + '\\n';
+            }
+            
+            const EXPORT_CHUNK_LINES = """ + str(EXPORT_CHUNK_LINES) + """;
+            const EXPORT_TYPES = """ + json.dumps(EXPORT_FORMATS) + """;
+            const CSV_HEADER = """ + json.dumps(CSV_HEADER, ensure_ascii=False) + """;
+            
+            // Alla träffar för filterläget i meddelandet som en Blob av delar om
+            // EXPORT_CHUNK_LINES rader, så ingen enskild sträng växer med resultatet
+            async function exportDocuments(query) {
+                const matches = await searchDocuments(query.search, () => true);
+                await ready;
+                const range = monthRange(query.from, query.to);
+                const positions = bitPositions(filterBitset(query.types, query.depts, query.cats, matches, range));
+                const format = query.format === 'jsonl' ? 'jsonl' : 'csv';
+                const row = format === 'jsonl' ? jsonlRow : csvRow;
+                
+                // Lägg till BOM för UTF-8 så Excel förstår kodningen; semikolon som separator
+                const parts = format === 'csv' ? ['\\ufeff' + CSV_HEADER + '\\n'] : [];
+                let lines = [];
+                let start = 0, p = 0;
+                for (let index = 0; index < manifest.shards.length && p < positions.length; index++) {
+                    const end = start + manifest.shards[index].count;
+                    if (positions[p] < end) {
+                        const shard = nameColumns(await loadShard(index));
+                        for (; p < positions.length && positions[p] < end; p++) {
+                            lines.push(row(shard, positions[p] - start));
+                            if (lines.length === EXPORT_CHUNK_LINES) {
+                                parts.push(lines.join(''));
+                                lines = [];
+                            }
+                        }
+                    }
+                    start = end;
+                }
+                parts.push(lines.join(''));
+                const blob = new Blob(parts, { type: EXPORT_TYPES[format] });
+                postMessage({ type: 'export', id: query.id, format, blob });
+            }
+    """
+
+def write_assets(assets_dir=ASSETS_DIR):
+    """Skriv CSS, JavaScript och frågemotorns worker som innehållshashade filer och returnera sökvägarna"""
+    assets = {
+        'css': write_static_file('dashboard', render_stylesheet(), '.css', assets_dir),
+        'js': write_static_file('dashboard', render_script(), '.js', assets_dir),
+        'worker': write_static_file('query-worker', render_worker_script(), '.js', assets_dir)
+    }
+    remove_stale_files(assets.values(), assets_dir)
+    return assets
+
+def render_dashboard(out, assets, scan, manifest, view=None):
+    """Skriv dashboardens HTML fragment för fragment till out; med view blir sidan en förfiltrerad vy"""
+    counts = scan.counts
+    sorted_departments = scan.departments
+    sorted_categories = scan.categories
+    dept_count = scan.cube.marginal(2)
+    cat_count = scan.cube.marginal(3)
+    total_count = sum(counts.values())
+    kd_count = counts['Kommittédirektiv']
+    ds_count = counts['Ds/PM']
+    sou_count = counts['SOU']
+    ru_count = counts['Regeringsuppdrag']
+    rap_count = counts['Rapport']
+    if view:
+        # Vyn ligger i VIEWS_DIR, men alla sökvägar i den är relativa till dashboardens rot
+        title = view.title
+        head = '<base href="../">'
+        intro = (f'{view.kind}: {view.title} · <a href="{OUTPUT_FILE}">Alla dokument</a> · '
+                 f'<a href="{VIEWS_DIR}/{OUTPUT_FILE}">Alla vyer</a>')
+    else:
+        title = 'Komplett Dashboard'
+        head = ''
+        intro = (f'Sök och filtrera bland regeringsdokument · '
+                 f'<a href="{VIEWS_DIR}/{OUTPUT_FILE}">Vyer per departement, kategori och dokumenttyp</a>')
+        if 'exports' in manifest:
+            intro += ' · Alla dokument som ' + ' eller '.join(
+                f'<a href="{EXPORT_URL}/{os.path.basename(path)}" download>{export_format.upper()}</a>'
+                for export_format, path in manifest['exports'].items()) + ' (gzip)'
+    
+    out.write(f"""
+    <!DOCTYPE html>
+    <html lang="sv">
+    <head>
+        <title>Regeringens dokument - {title}</title>
+        <meta charset="utf-8">
+        {head}
+        <link rel="stylesheet" href="{assets['css']}">
     </head>
     <body>
         <div class="container">
             <div class="header">
                 <h1>Regeringens dokument</h1>
-                <p>Sök och filtrera bland regeringsdokument</p>
+                <p>{intro}</p>
                 <p>Senast uppdaterad: {stockholm_time.strftime('%Y-%m-%d %H:%M')}</p>
             </div>
             
             <div class="stats" id="stats">
                 <div class="stat-box">
-                    <div class="stat-number">{len(alla_dokument)}</div>
+                    <div class="stat-number">{total_count}</div>
                     <div class="stat-label">Totalt</div>
                 </div>
                 <div class="stat-box">
-                    <div class="stat-number">{len(kd_lista)}</div>
+                    <div class="stat-number">{kd_count}</div>
                     <div class="stat-label">Kommittédirektiv</div>
                 </div>
                 <div class="stat-box">
-                    <div class="stat-number">{len(ds_lista)}</div>
+                    <div class="stat-number">{ds_count}</div>
                     <div class="stat-label">Ds/PM</div>
                 </div>
                 <div class="stat-box">
-                    <div class="stat-number">{len(sou_lista)}</div>
+                    <div class="stat-number">{sou_count}</div>
                     <div class="stat-label">SOU</div>
                 </div>
                 <div class="stat-box">
-                    <div class="stat-number">{len(ru_lista)}</div>
+                    <div class="stat-number">{ru_count}</div>
                     <div class="stat-label">Regeringsuppdrag</div>
                 </div>
                 <div class="stat-box">
-                    <div class="stat-number">{len(rap_lista)}</div>
+                    <div class="stat-number">{rap_count}</div>
                     <div class="stat-label">Rapporter</div>
                 </div>
             </div>
@@ -282,7 +2842,8 @@ def create_complete_dashboard():
                 <button onclick="selectAllDocTypes()">Välj alla dokumenttyper</button>
                 <button onclick="selectAllDepartments()">Välj alla departement</button>
                 <button onclick="selectAllCategories()">Välj alla kategorier</button>
-                <button onclick="exportResults()">Exportera resultat (CSV)</button>
+                <button onclick="exportResults('csv')">Exportera resultat (CSV)</button>
+                <button onclick="exportResults('jsonl')">Exportera resultat (JSONL)</button>
             </div>
             
             <div class="filters">
@@ -292,31 +2853,31 @@ def create_complete_dashboard():
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="doctype-filter" value="Kommittédirektiv" onchange="filterDocuments()" checked>
-                                Kommittédirektiv ({len(kd_lista)})
+                                Kommittédirektiv <span class="facet-count">({kd_count})</span>
                             </label>
                         </div>
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="doctype-filter" value="Ds/PM" onchange="filterDocuments()" checked>
-                                Ds/PM ({len(ds_lista)})
+                                Ds/PM <span class="facet-count">({ds_count})</span>
                             </label>
                         </div>
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="doctype-filter" value="SOU" onchange="filterDocuments()" checked>
-                                SOU ({len(sou_lista)})
+                                SOU <span class="facet-count">({sou_count})</span>
                             </label>
                         </div>
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="doctype-filter" value="Regeringsuppdrag" onchange="filterDocuments()" checked>
-                                Regeringsuppdrag ({len(ru_lista)})
+                                Regeringsuppdrag <span class="facet-count">({ru_count})</span>
                             </label>
                         </div>
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="doctype-filter" value="Rapport" onchange="filterDocuments()" checked>
-                                Rapporter ({len(rap_lista)})
+                                Rapporter <span class="facet-count">({rap_count})</span>
                             </label>
                         </div>
                     </div>
@@ -325,399 +2886,1087 @@ def create_complete_dashboard():
                 <div class="filter-section">
                     <h3>Departement ({len(sorted_departments)} st)</h3>
                     <div id="departments">
-    """
+    """)
     
     # Lägg till departement-checkboxar
-    for dept_id, dept_name in sorted_departments:
-        html_content += f"""
+    out.writelines(f"""
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="dept-filter" value="{dept_id}" onchange="filterDocuments()">
-                                {dept_name}
+                                {dept_name} <span class="facet-count">({dept_count[dept_id]})</span>
                             </label>
                         </div>
-        """
+        """ for dept_id, dept_name in sorted_departments)
     
-    html_content += f"""
+    out.write(f"""
                     </div>
                 </div>
                 
                 <div class="filter-section">
                     <h3>Kategorier ({len(sorted_categories)} st)</h3>
                     <div id="categories">
-    """
+    """)
     
     # Lägg till kategori-checkboxar
-    for cat_id, cat_name in sorted_categories:
-        html_content += f"""
+    out.writelines(f"""
                         <div class="checkbox-item">
                             <label>
                                 <input type="checkbox" class="cat-filter" value="{cat_id}" onchange="filterDocuments()">
-                                {cat_name}
+                                {cat_name} <span class="facet-count">({cat_count[cat_id]})</span>
                             </label>
                         </div>
-        """
+        """ for cat_id, cat_name in sorted_categories)
     
-    html_content += """
+    # Datumfältens gränser: äldsta och nyaste månaden med daterade dokument
+    months = [f"{month // 100}-{month % 100:02d}" for month, _ in manifest['timeline'] if month]
+    month_limits = f'min="{min(months)}" max="{max(months)}"' if months else ''
+    out.write(f"""
                     </div>
                 </div>
             </div>
             
+            <div class="timeline">
+                <div class="timeline-controls">
+                    <h3>Tidslinje</h3>
+                    <label>Från <input type="month" id="dateFrom" {month_limits} onchange="filterDocuments()"></label>
+                    <label>Till <input type="month" id="dateTo" {month_limits} onchange="filterDocuments()"></label>
+                    <button onclick="clearDateRange()">Alla datum</button>
+                </div>
+                <div class="histogram" id="histogram"></div>
+                <div class="histogram-axis"><span id="histogramStart"></span><span id="histogramEnd"></span></div>
+            </div>
+            
             <div class="results">
-                <input type="text" id="searchBox" placeholder="Sök i titlar, sammanfattningar och ID..." onkeyup="filterDocuments()">
-                <div class="result-count" id="resultCount">Visar alla dokument</div>
+                <input type="text" id="searchBox" placeholder="Sök i titlar, sammanfattningar och ID..." oninput="scheduleFilter()">
+                <div class="result-count" id="resultCount">Laddar dokument...</div>
+                <div class="load-status" id="loadStatus"></div>
                 <div id="document-list"></div>
             </div>
         </div>
         
         <script>
-            // Lagra all dokument-data
-            const allDocuments = """ + json.dumps(alla_dokument, ensure_ascii=False) + """;
-            const allCodes = """ + json.dumps(all_codes, ensure_ascii=False) + """;
-            let currentFilteredDocuments = [];
-            
-            // Initial visning
-            window.onload = function() {
-                filterDocuments();
-            };
-            
-            function filterDocuments() {
-                // Hämta valda filter
-                const selectedDocTypes = Array.from(document.querySelectorAll('.doctype-filter:checked')).map(cb => cb.value);
-                const selectedDepts = Array.from(document.querySelectorAll('.dept-filter:checked')).map(cb => cb.value);
-                const selectedCats = Array.from(document.querySelectorAll('.cat-filter:checked')).map(cb => cb.value);
-                const searchTerm = document.getElementById('searchBox').value.toLowerCase();
-                
-                // Filtrera dokument
-                currentFilteredDocuments = allDocuments.filter(doc => {
-                    // Kontrollera dokumenttyp
-                    if (!selectedDocTypes.includes(doc.document_type)) {
-                        return false;
-                    }
-                    
-                    // Kontrollera departement (om några valda)
-                    if (selectedDepts.length > 0) {
-                        const deptMatch = doc.senders && doc.senders.some(sender => selectedDepts.includes(String(sender)));
-                        if (!deptMatch) return false;
-                    }
-                    
-                    // Kontrollera kategorier (om några valda)
-                    if (selectedCats.length > 0) {
-                        const catMatch = doc.categories && doc.categories.some(cat => selectedCats.includes(String(cat)));
-                        if (!catMatch) return false;
-                    }
-                    
-                    // Kontrollera sökterm
-                    if (searchTerm) {
-                        const searchableText = (
-                            (doc.title || '') + ' ' + 
-                            (doc.summary || '') + ' ' +
-                            (doc.id || '')
-                        ).toLowerCase();
-                        if (!searchableText.includes(searchTerm)) return false;
-                    }
-                    
-                    return true;
-                });
-                
-                // Sortera efter publiceringsdatum (nyast först)
-                currentFilteredDocuments.sort((a, b) => {
-                    const dateA = new Date(a.published || '1900-01-01');
-                    const dateB = new Date(b.published || '1900-01-01');
-                    return dateB - dateA;
-                });
-                
-                // Uppdatera resultaträknare
-                document.getElementById('resultCount').textContent = 
-                    `Visar ${currentFilteredDocuments.length} av ${allDocuments.length} dokument`;
-                
-                // Visa dokument
-                const listElement = document.getElementById('document-list');
-                listElement.innerHTML = '';
-                
-                // Begränsa till 500 dokument för prestanda
-                const documentsToShow = currentFilteredDocuments.slice(0, 500);
-                
-                documentsToShow.forEach(doc => {
-                    const docElement = document.createElement('div');
-                    docElement.className = 'document-item';
-                    
-                    // Hämta departementnamn
-                    const deptNames = (doc.senders || []).map(s => 
-                        allCodes[String(s)] || `Okänt (${s})`
-                    ).join(', ');
-                    
-                    // Hämta kategorinamn
-                    const catNames = (doc.categories || []).map(c => 
-                        allCodes[String(c)] || `Okänd (${c})`
-                    ).join(', ');
-                    
-                    // Badge-klass baserat på dokumenttyp
-                    let badgeClass = 'doc-type-badge ';
-                    if (doc.document_type === 'Kommittédirektiv') badgeClass += 'badge-kd';
-                    else if (doc.document_type === 'Ds/PM') badgeClass += 'badge-ds';
-                    else if (doc.document_type === 'SOU') badgeClass += 'badge-sou';
-                    else if (doc.document_type === 'Regeringsuppdrag') badgeClass += 'badge-ru';
-                    else if (doc.document_type === 'Rapport') badgeClass += 'badge-rap';
-                    
-                    docElement.innerHTML = `
-                        <div class="document-title">
-                            <span class="${badgeClass}">${doc.document_type}</span>
-                            ${doc.title || 'Ingen titel'}
-                        </div>
-                        <div class="document-meta">
-                            <strong>ID:</strong> ${doc.id || 'Inget ID'} | 
-                            <strong>Publicerad:</strong> ${doc.published || 'Okänt datum'}
-                            ${deptNames ? ` | <strong>Departement:</strong> ${deptNames}` : ''}
-                            ${catNames ? ` | <strong>Kategorier:</strong> ${catNames}` : ''}
-                        </div>
-                        ${doc.summary ? `<div class="document-summary">${doc.summary}</div>` : ''}
-                        ${doc.url ? `<div style="margin-top: 10px;"><a href="https://www.regeringen.se${doc.url}" target="_blank">Läs mer →</a></div>` : ''}
-                    `;
-                    
-                    listElement.appendChild(docElement);
-                });
-                
-                if (currentFilteredDocuments.length === 0) {
-                    listElement.innerHTML = '<p style="text-align: center; color: #666; padding: 40px;">Inga dokument matchar de valda filtren.</p>';
-                } else if (currentFilteredDocuments.length > 500) {
-                    listElement.innerHTML += '<p style="text-align: center; color: #666; padding: 20px;"><strong>Visar de 500 senaste dokumenten.</strong> Förfina din sökning för att se fler resultat.</p>';
-                }
-                
-                // Uppdatera statistik
-                updateStatistics(currentFilteredDocuments);
-            }
-            
-            function updateStatistics(documents) {
-                const kdCount = documents.filter(d => d.document_type === 'Kommittédirektiv').length;
-                const dsCount = documents.filter(d => d.document_type === 'Ds/PM').length;
-                const souCount = documents.filter(d => d.document_type === 'SOU').length;
-                const ruCount = documents.filter(d => d.document_type === 'Regeringsuppdrag').length;
-                const rapCount = documents.filter(d => d.document_type === 'Rapport').length;
-                
-                document.getElementById('stats').innerHTML = `
-                    <div class="stat-box">
-                        <div class="stat-number">${documents.length}</div>
-                        <div class="stat-label">Filtrerade</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">${kdCount}</div>
-                        <div class="stat-label">Kommittédirektiv</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">${dsCount}</div>
-                        <div class="stat-label">Ds/PM</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">${souCount}</div>
-                        <div class="stat-label">SOU</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">${ruCount}</div>
-                        <div class="stat-label">Regeringsuppdrag</div>
-                    </div>
-                    <div class="stat-box">
-                        <div class="stat-number">${rapCount}</div>
-                        <div class="stat-label">Rapporter</div>
-                    </div>
-                `;
-            }
-            
-            function clearAllFilters() {
-                document.querySelectorAll('input[type="checkbox"]').forEach(cb => cb.checked = false);
-                document.getElementById('searchBox').value = '';
-                // Behåll dokumenttyper markerade
-                document.querySelectorAll('.doctype-filter').forEach(cb => cb.checked = true);
-                filterDocuments();
-            }
-            
-            function selectAllDocTypes() {
-                document.querySelectorAll('.doctype-filter').forEach(cb => cb.checked = true);
-                filterDocuments();
-            }
-            
-            function selectAllDepartments() {
-                document.querySelectorAll('.dept-filter').forEach(cb => cb.checked = true);
-                filterDocuments();
-            }
-            
-            function selectAllCategories() {
-                document.querySelectorAll('.cat-filter').forEach(cb => cb.checked = true);
-                filterDocuments();
-            }
-            
-            function exportResults() {
-                if (currentFilteredDocuments.length === 0) {
-                    alert('Inga dokument att exportera!');
-                    return;
-                }
-                
-                // Lägg till BOM för UTF-8 så Excel förstår kodningen
-                const BOM = '\\ufeff';
-                
-                // Skapa CSV-innehåll med semikolon som separator
-                let csv = BOM + 'Dokumenttyp;ID;Titel;Publicerad;Departement;Kategorier;URL\\n';
-                
-                currentFilteredDocuments.forEach(doc => {
-                    const deptNames = (doc.senders || []).map(s => 
-                        allCodes[String(s)] || `Okänt (${s})`
-                    ).join(', ');
-                    
-                    const catNames = (doc.categories || []).map(c => 
-                        allCodes[String(c)] || `Okänd (${c})`
-                    ).join(', ');
-                    
-                    const row = [
-                        doc.document_type,
-                        doc.id || '',
-                        `"${(doc.title || '').replace(/"/g, '""')}"`,
-                        doc.published || '',
-                        `"${deptNames.replace(/"/g, '""')}"`,
-                        `"${catNames.replace(/"/g, '""')}"`,
-                        doc.url ? `https://www.regeringen.se${doc.url}` : ''
-                    ].join(';');
-                    
-                    csv += row + '\\n';
-                });
-                
-                // Skapa och ladda ner fil
-                const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
-                const link = document.createElement('a');
-                const url = URL.createObjectURL(blob);
-                link.setAttribute('href', url);
-                link.setAttribute('download', `regeringsdokument_${new Date().toISOString().slice(0,10)}.csv`);
-                link.style.visibility = 'hidden';
-                document.body.appendChild(link);
-                link.click();
-                document.body.removeChild(link);
-            }
-            
-            // Lägg till kortkommandon
-            document.addEventListener('keydown', function(e) {
-                // Ctrl/Cmd + K för att fokusera på sökrutan
-                if ((e.ctrlKey || e.metaKey) && e.key === 'k') {
-                    e.preventDefault();
-                    document.getElementById('searchBox').focus();
-                }
-                // Escape för att rensa sökning
-                if (e.key === 'Escape') {
-                    document.getElementById('searchBox').value = '';
-                    filterDocuments();
-                }
-            });
+            // Manifest över datafilerna (nyaste först), dokumenttyper och använda koder
+            const manifest = """)
+    page_manifest = dict(manifest, worker=assets['worker'])
+    # Frågeservern söker i hela lagret, så vyerna filtrerar alltid själva
+    if QUERY_API and not view:
+        page_manifest['api'] = QUERY_API
+    json.dump(page_manifest, out, ensure_ascii=False)
+    out.write(f""";
         </script>
+        <script src="{assets['js']}"></script>
     </body>
     </html>
-    """
+    """)
+
+def write_dashboard(path, assets, scan, manifest, view=None):
+    """Skriv dashboarden via en temporär fil så att en halvskriven sida aldrig publiceras"""
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8', buffering=CHUNK_SIZE) as out:
+        render_dashboard(out, assets, scan, manifest, view)
+    os.replace(tmp_file, path)
+
+class AggregationCube:
+    """Antal dokument per dokumenttyp × år × departement × kategori"""
+    
+    def __init__(self):
+        self.cells = defaultdict(int)
+    
+    def add(self, type_index, year, departments, categories):
+        """Räkna ett dokument; year är 'undated' om datum saknas"""
+        # Dokumentet räknas i varje kombination av sina departement och kategorier,
+        # och dessutom under None ("alla") i båda dimensionerna. Då är cells[typ, år,
+        # None, None] antalet dokument, och summor över typ och år blir exakta trots
+        # att ett dokument kan ha flera departement och kategorier.
+        for department in (None, *departments):
+            for category in (None, *categories):
+                self.cells[type_index, year, department, category] += 1
+    
+    def marginal(self, dimension):
+        """Antal dokument per värde i en dimension: 0 typ, 1 år, 2 departement, 3 kategori"""
+        totals = defaultdict(int)
+        for key, count in self.cells.items():
+            if (key[2] is not None) == (dimension == 2) and (key[3] is not None) == (dimension == 3):
+                totals[key[dimension]] += count
+        return totals
+    
+    def client_data(self):
+        """Kuben summerad över år för sidan: [typ][departement][kategori], '' betyder alla"""
+        data = [defaultdict(lambda: defaultdict(int)) for _ in DOCUMENT_TYPES]
+        for (type_index, _, department, category), count in self.cells.items():
+            data[type_index]['' if department is None else department]['' if category is None else category] += count
+        return data
+
+def scan_store(conn, codes):
+    """Gå igenom lagret i ett enda svep och samla antal (AggregationCube) och dokument per år"""
+    return scan_documents((Document.from_json(data, codes) for _, data in iter_document_rows(conn)), codes)
+
+def scan_documents(documents, codes):
+    """Som scan_store, men över redan avkodade Document (t.ex. en vys urval)"""
+    cube = AggregationCube()
+    documents_by_year = defaultdict(list)
+    used_codes = set()
+    departments = codes.departments
+    
+    for doc in documents:
+        year = _shard_year(doc.published)
+        documents_by_year[year].append(doc)
+        used_codes.update(doc.senders)
+        used_codes.update(doc.categories)
+        cube.add(doc.type_index, year, [sender for sender in doc.senders if sender in departments], doc.categories)
+    
+    type_counts = cube.marginal(0)
+    return StoreScan({doc_type: type_counts[i] for i, doc_type in enumerate(DOCUMENT_TYPES)},
+                     sorted(((code, codes.name(code)) for code in cube.marginal(2)), key=lambda x: x[1]),
+                     sorted(((code, codes.name(code, 'Okänd')) for code in cube.marginal(3)), key=lambda x: x[1]),
+                     cube, documents_by_year, used_codes)
+
+def write_client_data(scan, codes, data_dir=DATA_DIR, ordered_shards=None):
+    """Skriv dokumenten som datafiler (nyaste först), sökindex och facetter; returnera manifestet för sidan"""
+    if ordered_shards is None:
+        ordered_shards = order_shards(scan.documents_by_year)
+    shards = write_shards(ordered_shards, data_dir)
+    search = write_client_search_index(ordered_shards, data_dir=data_dir)
+    facets = write_facets(ordered_shards,
+                          [dept_id for dept_id, _ in scan.departments],
+                          [cat_id for cat_id, _ in scan.categories],
+                          data_dir)
+    timeline = build_timeline(doc for _, documents in ordered_shards for doc in documents)
+    del ordered_shards
+    cube = write_data_file('cube', scan.cube.client_data(), data_dir)
+    
+    manifest = {
+        'total': sum(scan.counts.values()),
+        'counts': scan.counts,
+        'types': DOCUMENT_TYPES,
+        'codes': {str(code): codes.names[code] for code in sorted(scan.used_codes, key=str) if code in codes.names},
+        'initialDocuments': INITIAL_DOCUMENTS,
+        'shards': shards,
+        'search': search,
+        'facets': facets,
+        'cube': cube,
+        'timeline': timeline
+    }
+    remove_stale_files(client_data_files(manifest), data_dir)
+    return manifest
+
+def _csv_quoted(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def export_lines(documents, codes, export_format='csv'):
+    """Exportrader med radslut för documents, som CSV eller JSONL"""
+    # CSV:n har samma kolumner som sidans export; JSONL har ett objekt per rad med
+    # sammanfattningen och namnen som listor
+    csv = export_format == 'csv'
+    # Namnen slås upp en gång per unik kodlista och återanvänds sedan, eftersom
+    # många dokument har samma avsändare och kategorier
+    name_columns = {}
+    
+    def names(doc_codes, unknown):
+        column = name_columns.get((doc_codes, unknown))
+        if column is None:
+            column = [codes.name(code, unknown) for code in doc_codes]
+            if csv:
+                column = _csv_quoted(', '.join(column))
+            name_columns[doc_codes, unknown] = column
+        return column
+    
+    if csv:
+        # BOM för UTF-8 så Excel förstår kodningen; semikolon som separator
+        yield '\ufeff' + CSV_HEADER + '\n'
+    for doc in documents:
+        date = str(doc.published)
+        published = f"{date[:4]}-{date[4:6]}-{date[6:8]}" if doc.published else ''
+        url = f"https://www.regeringen.se{doc.url}" if doc.url else ''
+        if csv:
+            yield ';'.join([
+                DOCUMENT_TYPES[doc.type_index],
+                doc.id,
+                _csv_quoted(doc.title),
+                published,
+                names(doc.senders, 'Okänt'),
+                names(doc.categories, 'Okänd'),
+                url
+            ]) + '\n'
+        else:
+            yield json.dumps({
+                'type': DOCUMENT_TYPES[doc.type_index],
+                'id': doc.id,
+                'title': doc.title,
+                'summary': doc.summary,
+                'published': published,
+                'departments': names(doc.senders, 'Okänt'),
+                'categories': names(doc.categories, 'Okänd'),
+                'url': url
+            }, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def export_chunks(lines, size=EXPORT_CHUNK_LINES):
+    """Slå ihop exportrader till UTF-8-delar om size rader"""
+    lines = iter(lines)
+    while True:
+        chunk = ''.join(islice(lines, size))
+        if not chunk:
+            break
+        yield chunk.encode('utf-8')
+
+def write_exports(scan, codes, export_dir=EXPORT_DIR):
+    """Skriv hela samlingen gzippad som CSV och JSONL, nyaste först; returnerar {format: sökväg}"""
+    # Filerna skrivs i delar och blir aldrig en hel sträng i minnet. De har fasta
+    # namn eftersom de ersätts vid publiceringen i stället för att läggas till.
+    ordered_shards = order_shards(scan.documents_by_year)
+    exports = {}
+    for export_format in EXPORT_FORMATS:
+        documents = (doc for _, shard in ordered_shards for doc in shard)
+        exports[export_format] = write_gzip_file(
+            f'{EXPORT_NAME}.{export_format}.gz', export_chunks(export_lines(documents, codes, export_format)), export_dir)
+    # Innehållshashade exporter från tidigare versioner
+    remove_stale_files(exports.values(), export_dir)
+    return exports
+
+def _document_digest(doc):
+    """Fingeravtryck för ett dokuments innehåll, för att se vilka vyer som ändrats"""
+    fields = [getattr(doc, slot) for slot in Document.__slots__]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode('utf-8')).digest()
+
+def _view_slug(code):
+    return re.sub(r'[^\w-]+', '-', str(code)).strip('-')
+
+def _view_file(view):
+    return os.path.join(VIEWS_DIR, view.name + '.html')
+
+def plan_views(scan, codes, version):
+    """Dela upp dokumenten i vyer; returnerar [(View, dokument, fingeravtryck)] i listningsordning"""
+    # Fingeravtrycket täcker vyns dokument, kodtabellen och version, så en vy
+    # med samma fingeravtryck som förra bygget är redan aktuell
+    common = hashlib.sha1(json.dumps([version, sorted((str(code), name) for code, name in codes.names.items())],
+                                     ensure_ascii=False).encode('utf-8'))
+    type_views = [View(f"typ-{os.path.splitext(os.path.basename(path))[0]}", doc_type, 'Dokumenttyp')
+                  for doc_type, path in FEEDS]
+    department_views = {code: View(f"departement-{_view_slug(code)}", name, 'Departement')
+                        for code, name in scan.departments}
+    category_views = {code: View(f"kategori-{_view_slug(code)}", name, 'Kategori')
+                      for code, name in scan.categories}
+    
+    members = defaultdict(list)
+    digests = {}
+    for documents in scan.documents_by_year.values():
+        for doc in documents:
+            digest = _document_digest(doc)
+            views = ([type_views[doc.type_index]] +
+                     [department_views[code] for code in doc.senders if code in department_views] +
+                     [category_views[code] for code in doc.categories if code in category_views])
+            for view in views:
+                members[view].append(doc)
+                if view not in digests:
+                    digests[view] = common.copy()
+                digests[view].update(digest)
+    
+    return [(view, members[view], digests[view].hexdigest())
+            for view in type_views + list(department_views.values()) + list(category_views.values())
+            if view in members]
+
+def write_view(view, documents, codes, assets):
+    """Bygg en vy: egna datafiler i VIEWS_DIR/<namn>/ och sidan VIEWS_DIR/<namn>.html"""
+    # Körs i en egen process från write_views()
+    scan = scan_documents(documents, codes)
+    manifest = write_client_data(scan, codes, f"{VIEWS_DIR}/{view.name}", order_view_shards(documents))
+    write_dashboard(_view_file(view), assets, scan, manifest, view)
+    return view
+
+def write_views_index(planned, assets):
+    """Skriv VIEWS_DIR/index.html med länkar till alla vyer, grupperade per sort"""
+    sections = defaultdict(list)
+    for view, documents, _ in planned:
+        sections[view.kind].append(f"""
+                        <div class="checkbox-item">
+                            <a href="{VIEWS_DIR}/{view.name}.html">{view.title}</a>
+                            <span class="facet-count">({len(documents)})</span>
+                        </div>""")
+    
+    path = os.path.join(VIEWS_DIR, OUTPUT_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as out:
+        out.write(f"""
+    <!DOCTYPE html>
+    <html lang="sv">
+    <head>
+        <title>Regeringens dokument - Vyer</title>
+        <meta charset="utf-8">
+        <base href="../">
+        <link rel="stylesheet" href="{assets['css']}">
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Regeringens dokument</h1>
+                <p>Förfiltrerade vyer per dokumenttyp, departement och kategori ·
+                   <a href="{OUTPUT_FILE}">Alla dokument</a></p>
+            </div>
+            <div class="filters">
+    """)
+        for kind, items in sections.items():
+            out.write(f"""
+                <div class="filter-section">
+                    <h3>{kind} ({len(items)} st)</h3>""")
+            out.writelines(items)
+            out.write("""
+                </div>""")
+        out.write("""
+            </div>
+        </div>
+    </body>
+    </html>
+    """)
+    os.replace(path + '.tmp', path)
+
+def write_views(scan, codes, assets, version, workers=VIEW_WORKERS):
+    """Skriv förfiltrerade vyer per dokumenttyp, departement och kategori; returnerar (antal, antal ombyggda)"""
+    # Varje vy har egna datafiler med bara sina dokument, så sidan hämtar inget
+    # utanför urvalet. Bara vyer vars urval (eller kodtabell, tillgångar och
+    # version) ändrats sedan förra bygget enligt VIEWS_STATE_FILE byggs om.
+    planned = plan_views(scan, codes, [version, assets])
+    try:
+        with open(VIEWS_STATE_FILE, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    
+    changed = [(view, documents) for view, documents, digest in planned
+               if previous.get(view.name) != digest or not os.path.exists(_view_file(view))]
+    # De största vyerna först, så att processerna blir klara ungefär samtidigt
+    changed.sort(key=lambda job: len(job[1]), reverse=True)
+    os.makedirs(VIEWS_DIR, exist_ok=True)
+    if changed:
+        # Vyerna byggs parallellt i en processpool
+        views, documents = zip(*changed)
+        with ProcessPoolExecutor(min(workers, len(changed))) as pool:
+            list(pool.map(write_view, views, documents, repeat(codes), repeat(assets)))
+    
+    current = {view.name: digest for view, _, digest in planned}
+    # Vyer som inte längre finns tas bort
+    for name in previous.keys() - current.keys():
+        shutil.rmtree(os.path.join(VIEWS_DIR, name), ignore_errors=True)
+        if os.path.exists(os.path.join(VIEWS_DIR, name + '.html')):
+            os.remove(os.path.join(VIEWS_DIR, name + '.html'))
+    write_views_index(planned, assets)
+    with open(VIEWS_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)
+    return len(planned), len(changed)
+
+def _peak_memory_mb():
+    """Processens högsta minnesanvändning hittills i MB, None där resource saknas"""
+    if resource is None:
+        return None
+    # ru_maxrss anges i kB på Linux men i bytes på macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+class BuildMetrics:
+    """Tider och mått för ett bygge, per steg och per flöde, sparade som JSON"""
+    
+    def __init__(self):
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.feeds = {}
+        self.output = {}
+    
+    @contextmanager
+    def stage(self, name):
+        """Mät tid och minnestopp för ett steg i bygget"""
+        # Processens topp kan bara växa: peak_increase_mb är hur mycket steget
+        # höjde den. tracemalloc skulle ge stegets egen topp men gör bygget
+        # ungefär dubbelt så långsamt och förvränger tiderna.
+        peak_before = _peak_memory_mb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = _peak_memory_mb()
+            self.stages[name] = {
+                'seconds': round(seconds, 4),
+                'process_peak_memory_mb': peak,
+                'peak_increase_mb': None if peak is None else round(peak - peak_before, 1)
+            }
+    
+    def record_fetch(self, codes, feeds):
+        """HTTP-tid och mottagna bytes per källa"""
+        for source, cached in [('codes', codes)] + list(feeds.items()):
+            self.feeds[source] = {
+                'http_seconds': round(cached.seconds, 4),
+                'bytes': cached.bytes,
+                'not_modified': cached.not_modified,
+                'fallback': cached.fallback
+            }
     
-    # Spara HTML-filen
-    with open('index.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    def record_sync(self, stats, counts):
+        """Parsetid, ändringar och antal dokument per flöde"""
+        for doc_type, stat in stats.items():
+            self.feeds[doc_type].update(parse_seconds=round(stat.seconds, 4),
+                                        new=stat.new, changed=stat.changed, removed=stat.removed)
+        for doc_type, count in counts.items():
+            self.feeds.setdefault(doc_type, {})['documents'] = count
     
-    print("\nKomplett dashboard skapad: index.html")
+    def record_output(self, manifest, assets):
+        """Storlek på index.html och filerna den refererar till"""
+        data_files = client_data_files(manifest)
+        self.output = {'html_bytes': os.path.getsize(OUTPUT_FILE)}
+        for name, paths in (('data', data_files), ('assets', list(assets.values()))):
+            self.output[name] = {
+                'files': len(paths),
+                'bytes': sum(os.path.getsize(path) for path in paths),
+                'gzip_bytes': sum(os.path.getsize(path + '.gz') for path in paths)
+            }
+        exports = list(manifest['exports'].values())
+        self.output['exports'] = {'files': len(exports), 'gzip_bytes': sum(map(os.path.getsize, exports))}
+    
+    def record_views(self, count, rebuilt):
+        """Antal förfiltrerade vyer och hur många av dem som byggdes om"""
+        self.output['views'] = {'pages': count, 'rebuilt': rebuilt}
+    
+    def write(self, path=METRICS_FILE, built=True):
+        """Skriv rapporten; built är False när bygget hoppades över"""
+        report = {
+            'started': self.started.isoformat(timespec='seconds'),
+            'built': built,
+            'seconds': round(time.perf_counter() - self.start, 4),
+            'process_peak_memory_mb': _peak_memory_mb(),
+            'python': platform.python_version(),
+            'stages': self.stages,
+            'feeds': self.feeds,
+            'output': self.output
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+def create_complete_dashboard(force=False):
+    """Skapa en interaktiv HTML-dashboard för alla regeringsdokument; returnerar True om den skrevs"""
+    # Tider och mått för varje körning skrivs till METRICS_FILE
+    metrics = BuildMetrics()
+    
+    # Hämta koder och alla dokumenttyper parallellt
+    print("Hämtar dokument...")
+    with metrics.stage('fetch'):
+        codes, feeds = fetch_all()
+    metrics.record_fetch(codes, feeds)
+    
+    # Bygget hoppas över om varken g0v.se-svaren eller skriptet har ändrats sedan förra gången
+    build_state = _build_state(codes, feeds)
+    if not force and os.path.exists(OUTPUT_FILE) and build_state == _read_build_state():
+        print("Inga ändringar sedan förra bygget, dashboarden är redan aktuell")
+        metrics.write(built=False)
+        return False
+    
+    # Synka lagret; bara nya och ändrade dokument skrivs
+    with closing(open_store()) as conn:
+        with metrics.stage('sync'):
+            stats = sync_store(conn, codes, feeds)
+        for doc_type, stat in stats.items():
+            print(f"  {doc_type}: {stat.new} nya, {stat.changed} ändrade, {stat.removed} borttagna")
+        
+        code_table = load_code_table(conn)
+        with metrics.stage('scan'):
+            scan = scan_store(conn, code_table)
+    
+    counts = scan.counts
+    metrics.record_sync(stats, counts)
+    total_count = sum(counts.values())
+    kd_count = counts['Kommittédirektiv']
+    ds_count = counts['Ds/PM']
+    sou_count = counts['SOU']
+    ru_count = counts['Regeringsuppdrag']
+    rap_count = counts['Rapport']
+    
+    print(f"- {kd_count} kommittédirektiv")
+    print(f"- {ds_count} Ds/PM")
+    print(f"- {sou_count} SOU")
+    print(f"- {ru_count} regeringsuppdrag")
+    print(f"- {rap_count} rapporter")
+    print(f"\nTotalt: {total_count} dokument")
+    
+    with metrics.stage('write_data'):
+        manifest = write_client_data(scan, code_table)
+    with metrics.stage('exports'):
+        manifest['exports'] = write_exports(scan, code_table)
+    with metrics.stage('write_assets'):
+        assets = write_assets()
+    
+    # Skapa och spara HTML-filen
+    with metrics.stage('render'):
+        write_dashboard(OUTPUT_FILE, assets, scan, manifest)
+    with metrics.stage('views'):
+        view_count, rebuilt = write_views(scan, code_table, assets, build_state['script'])
+    _write_build_state(build_state)
+    metrics.record_output(manifest, assets)
+    metrics.record_views(view_count, rebuilt)
+    metrics.write()
+    
+    print(f"\nKomplett dashboard skapad: {OUTPUT_FILE}")
+    print(f"Vyer i {VIEWS_DIR}/: {view_count}, varav {rebuilt} ombyggda")
     print("\nStatistik:")
-    print(f"- Totalt antal dokument: {len(alla_dokument)}")
-    print(f"  - Kommittédirektiv: {len(kd_lista)}")
-    print(f"  - Ds/PM: {len(ds_lista)}")
-    print(f"  - SOU: {len(sou_lista)}")
-    print(f"  - Regeringsuppdrag: {len(ru_lista)}")
-    print(f"  - Rapporter: {len(rap_lista)}")
-    print(f"- Antal departement: {len(sorted_departments)}")
-    print(f"- Antal kategorier: {len(sorted_categories)}")
+    print(f"- Totalt antal dokument: {total_count}")
+    print(f"  - Kommittédirektiv: {kd_count}")
+    print(f"  - Ds/PM: {ds_count}")
+    print(f"  - SOU: {sou_count}")
+    print(f"  - Regeringsuppdrag: {ru_count}")
+    print(f"  - Rapporter: {rap_count}")
+    print(f"- Antal departement: {len(scan.departments)}")
+    print(f"- Antal kategorier: {len(scan.categories)}")
     
     # Visa årsfördelning
-    years_count = defaultdict(int)
-    for doc in alla_dokument:
-        if doc.get('published'):
-            try:
-                year = doc['published'][:4]
-                years_count[year] += 1
-            except:
-                pass
-    
+    years_count = scan.cube.marginal(1)
     print("\nDokument per år (senaste 5 åren):")
-    for year in sorted(years_count.keys(), reverse=True)[:5]:
+    for year in sorted((year for year in years_count if year != 'undated'), reverse=True)[:5]:
         print(f"- {year}: {years_count[year]} dokument")
     
     # Visa vanligaste kategorierna
-    cat_count = defaultdict(int)
-    for doc in alla_dokument:
-        for cat in doc.get('categories', []):
-            cat_name = all_codes.get(str(cat), f"Okänd ({cat})")
-            cat_count[cat_name] += 1
-    
+    cat_count = scan.cube.marginal(3)
     print("\nVanligaste kategorierna:")
-    for cat, count in sorted(cat_count.items(), key=lambda x: x[1], reverse=True)[:10]:
-        print(f"- {cat}: {count} dokument")
+    for cat_id, cat_name in sorted(scan.categories, key=lambda x: cat_count[x[0]], reverse=True)[:10]:
+        print(f"- {cat_name}: {cat_count[cat_id]} dokument")
+    
+    print(f"\nByggtid och mått: {METRICS_FILE}")
+    return True
 
 # Skapa även en funktion för att söka specifikt innehåll
-def search_documents(search_term, doc_types=None, departments=None, categories=None):
+def search_documents(search_term, doc_types=None, departments=None, categories=None, refresh=False,
+                     ranked=False, date_from=None, date_to=None):
     """Sök dokument baserat på kriterier"""
+    # date_from och date_to begränsar publiceringsdatum, t.ex. '2024' eller '2024-03'
+    dates = date_bounds(date_from, date_to)
     
-    # Hämta koder
-    codes_response = requests.get('https://g0v.se/api/codes.json')
-    all_codes = codes_response.json()
-    
-    # Lista med alla API:er
-    apis = [
-        ('Kommittédirektiv', 'https://g0v.se/rattsliga-dokument/kommittedirektiv.json'),
-        ('Ds/PM', 'https://g0v.se/rattsliga-dokument/departementsserien-och-promemorior.json'),
-        ('SOU', 'https://g0v.se/rattsliga-dokument/statens-offentliga-utredningar.json'),
-        ('Regeringsuppdrag', 'https://g0v.se/regeringsuppdrag.json'),
-        ('Rapport', 'https://g0v.se/rapporter.json')
-    ]
+    # Lagret synkas mot g0v.se först om det är äldre än STORE_MAX_AGE eller om refresh anges
+    conn, _, _ = update_store(doc_types, force=refresh)
+    with closing(conn):
+        # Med ranked söks hela ord även i de crawlade dokumentsidorna och träffarna
+        # sorteras efter BM25-poäng, bäst först
+        if ranked:
+            return _ranked_search(conn, search_term, doc_types, departments, categories, dates)
+        # Annars söks i ögonblicksbilden av lagret, så en ny process kan svara utan att
+        # läsa in hela lagret. Söktermen matchas som delsträng av titel, sammanfattning
+        # och id; departement och kategorier som delsträngar av kodernas namn.
+        snapshot = get_snapshot(conn)
+        positions, verify = snapshot.search(search_term, doc_types, departments, categories, dates)
+        
+        # Flerordssökningar kontrolleras mot hela texten, som tidigare, men direkt
+        # i ögonblicksbilden; bara träffarna läses och tolkas ur lagret
+        if verify:
+            term = search_term.lower()
+            positions = [position for position in positions if term in snapshot.text(position).lower()]
+        
+        return list(snapshot.iter_rows(conn, positions))
+
+def _ranked_search(conn, search_term, doc_types, departments, categories, dates):
+    """search_documents(ranked=True): fulltextträffar i BM25-ordning"""
+    index = get_fulltext_index(conn)
+    query_words = _WORD.findall(fold(search_term))
+    if query_words:
+        scores = index.search(query_words)
+        positions = sorted(scores, key=lambda position: (-scores[position], position))
+    else:
+        positions = range(len(index.rowids))
     
+    codes = load_code_table(conn)
+    senders = codes.matching(departments) if departments else None
+    category_codes = codes.matching(categories) if categories else None
     results = []
-    
-    for doc_type, api_url in apis:
-        # Hoppa över om specifika dokumenttyper är valda
-        if doc_types and doc_type not in doc_types:
+    for doc in _iter_rows(conn, [index.rowids[position] for position in positions]):
+        if doc_types and doc['document_type'] not in doc_types:
             continue
-            
-        response = requests.get(api_url)
-        documents = response.json()
+        document = Document.from_feed(doc, codes)
+        if senders is not None and senders.isdisjoint(document.senders):
+            continue
+        if category_codes is not None and category_codes.isdisjoint(document.categories):
+            continue
+        if dates and not dates[0] <= document.published <= dates[1]:
+            continue
+        results.append(doc)
+    return results
+
+def evaluate_standing_queries(queries, refresh=False, state_file=ALERTS_STATE_FILE):
+    """Kör sparade sökningar mot dokument som tillkommit sedan förra körningen; returnerar {namn: [dokument]}"""
+    queries = [StandingQuery(**query) if isinstance(query, dict) else query for query in queries]
+    try:
+        with open(state_file, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    
+    # Lagret synkas en gång, om det är äldre än STORE_MAX_AGE eller refresh anges
+    conn, _, _ = update_store(force=refresh)
+    with closing(conn):
+        # Vattenstämpeln är största prövade rowid; äldre tillståndsfiler har en tidsstämpel
+        since = state.get('rowid')
+        if since is None:
+            since = conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM documents WHERE first_seen <= ?',
+                                 (state.get('first_seen', ''),)).fetchone()[0]
+        codes = load_code_table(conn)
         
-        for doc in documents:
-            # Säkerställ att alla värden är strängar (konvertera None till '')
-            title = str(doc.get('title') or '')
-            summary = str(doc.get('summary') or '')
-            doc_id = str(doc.get('id') or '')
-            
-            # Sök i text
-            searchable_text = (title + ' ' + summary + ' ' + doc_id).lower()
-            
-            if search_term.lower() not in searchable_text:
+        # Kriterierna förbereds en gång: kodnamnen blir mängder av koder
+        prepared = defaultdict(list)
+        for query in queries:
+            senders = codes.matching(query.departments) if query.departments else None
+            categories = codes.matching(query.categories) if query.categories else None
+            for doc_type in query.doc_types or DOCUMENT_TYPES:
+                prepared[doc_type].append((query.name, query.term.lower(), senders, categories))
+        
+        # De nya dokumenten gås igenom i ett enda svep där varje dokument prövas mot
+        # alla sökningar; första körningen räknar alla dokument som nya
+        matches = {query.name: [] for query in queries}
+        latest = since
+        rows = conn.execute('SELECT rowid, document_type, data FROM documents WHERE rowid > ? ORDER BY rowid', (since,))
+        for latest, doc_type, data in rows:
+            if doc_type not in prepared:
                 continue
-            
-            # Filtrera på departement om angivet
-            if departments:
-                dept_match = False
-                for sender in doc.get('senders', []):
-                    dept_name = all_codes.get(str(sender), '')
-                    if any(dept.lower() in dept_name.lower() for dept in departments):
-                        dept_match = True
-                        break
-                if not dept_match:
+            doc = json.loads(data)
+            document = Document.from_feed(doc, codes)
+            text = document.text().lower()
+            # Varje sökterm prövas bara en gång per dokument även om flera sökningar delar den
+            term_found = {}
+            for name, term, senders, categories in prepared[doc_type]:
+                if senders is not None and senders.isdisjoint(document.senders):
                     continue
-            
-            # Filtrera på kategorier om angivet
-            if categories:
-                cat_match = False
-                for cat in doc.get('categories', []):
-                    cat_name = all_codes.get(str(cat), '')
-                    if any(category.lower() in cat_name.lower() for category in categories):
-                        cat_match = True
-                        break
-                if not cat_match:
+                if categories is not None and categories.isdisjoint(document.categories):
                     continue
-            
-            # Lägg till dokumenttyp och resultat
-            doc['document_type'] = doc_type
-            results.append(doc)
+                if term not in term_found:
+                    term_found[term] = term in text
+                if term_found[term]:
+                    matches[name].append(doc)
     
-    return results
+    # Nästa körning börjar efter de dokument som prövats nu
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump({'rowid': latest}, f)
+    return matches
+
+def _bitset(positions, total):
+    """Dokumentnummer som heltal att använda som bitmängd"""
+    return int.from_bytes(_bit_bytes(positions, total), 'little')
+
+def _bit_positions(bits):
+    """Satta bitar i ett heltal som sorterade dokumentnummer"""
+    positions = []
+    for index, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        if byte:
+            positions.extend(index * 8 + bit for bit in _BYTE_BITS[byte])
+    return positions
+
+def _code_list(value):
+    """Kommaseparerade koder ur en frågeparameter, sorterade och utan dubbletter"""
+    return tuple(sorted({_code_value(item) for item in value.split(',') if item}, key=str))
+
+class QueryIndex:
+    """Dokumenten i minnet med bitmängder per filter, för frågeservern"""
+    
+    # Dokumenten numreras som i sidans datafiler (nyaste först) och varje filter
+    # är ett heltal där bit i betyder dokument i, precis som i sidans frågemotor,
+    # så svaren blir desamma som sidan räknar fram själv.
+    
+    def __init__(self, version, codes, documents, departments, categories, full_text=None):
+        self.version = version
+        self.codes = codes
+        self.documents = documents
+        self.full_text = full_text
+        total = len(documents)
+        
+        types = [[] for _ in DOCUMENT_TYPES]
+        senders = {code: [] for code in departments}
+        category_postings = {code: [] for code in categories}
+        words = defaultdict(lambda: array('I'))
+        for position, doc in enumerate(documents):
+            types[doc.type_index].append(position)
+            for sender in doc.senders:
+                if sender in senders:
+                    senders[sender].append(position)
+            for category in doc.categories:
+                if category in category_postings:
+                    category_postings[category].append(position)
+            for word in set(_WORD.findall(fold(doc.text()))):
+                words[word].append(position)
+        
+        self.types = {t: _bitset(positions, total) for t, positions in enumerate(types)}
+        self.senders = {code: _bitset(positions, total) for code, positions in senders.items()}
+        self.categories = {code: _bitset(positions, total) for code, positions in category_postings.items()}
+        # Ordens postningar hålls som listor; bitmängder vore för stora för ovanliga ord
+        self.words = dict(words)
+        self._word_cache = {}
+        # Dokumenten är sorterade på datum, så ett datumintervall är ett sammanhängande
+        # intervall av dokumentnummer. Negerade datum är stigande (odaterade, 0, sist)
+        # och går att binärsöka.
+        self.date_keys = array('l', (-doc.published for doc in documents))
+        self.timeline = build_timeline(documents)
+    
+    @classmethod
+    def build(cls, conn):
+        """Läs in hela lagret ur ögonblicksbilden, med fulltextindex om sidor har crawlats"""
+        snapshot = get_snapshot(conn)
+        codes = snapshot.codes
+        scan = scan_documents(snapshot.iter_documents(), codes)
+        documents = [doc for _, shard in order_shards(scan.documents_by_year) for doc in shard]
+        page_texts = load_page_texts(conn)
+        full_text = None
+        if page_texts:
+            full_text = FullTextIndex.from_texts(doc.text() + ' ' + page_texts.get(doc.url, '') for doc in documents)
+        return cls(fulltext_version(conn), codes, documents,
+                   [code for code, _ in scan.departments], [code for code, _ in scan.categories], full_text)
+    
+    def _word_bits(self, query_word):
+        """Dokument med något ord som innehåller query_word"""
+        bits = self._word_cache.get(query_word)
+        if bits is None:
+            positions = set()
+            for word, postings in self.words.items():
+                if query_word in word:
+                    positions.update(postings)
+            bits = self._word_cache[query_word] = _bitset(positions, len(self.documents))
+        return bits
+    
+    def search(self, query_words):
+        """Dokument som innehåller alla sökord, None om ingen sökning"""
+        matches = None
+        for query_word in query_words:
+            bits = self._word_bits(query_word)
+            matches = bits if matches is None else matches & bits
+            if not matches:
+                break
+        return matches
+    
+    def _union(self, postings, keys):
+        bits = 0
+        for key in keys:
+            bits |= postings.get(key, 0)
+        return bits
+    
+    def _date_bits(self, dates):
+        """Dokument publicerade inom dates, (från, till) som heltal ÅÅÅÅMMDD"""
+        date_from, date_to = dates
+        start = bisect_left(self.date_keys, -date_to)
+        end = bisect_right(self.date_keys, -date_from)
+        return (1 << end) - (1 << start) if end > start else 0
+    
+    def _filter(self, types, departments, categories, matches, dates=None):
+        bits = self._union(self.types, types)
+        if departments:
+            bits &= self._union(self.senders, departments)
+        if categories:
+            bits &= self._union(self.categories, categories)
+        if matches is not None:
+            bits &= matches
+        if dates:
+            bits &= self._date_bits(dates)
+        return bits
+    
+    def histogram(self, bits):
+        """Antal satta bitar per månad: [[ÅÅÅÅMM, antal]] i tidslinjens ordning"""
+        ends = [start for _, start in self.timeline[1:]] + [len(self.documents)]
+        return [[month, ((bits >> start) & ((1 << (end - start)) - 1)).bit_count()]
+                for (month, start), end in zip(self.timeline, ends)]
+    
+    def query(self, query_words, types, departments, categories, dates=None):
+        """Svara på en fråga med samma innebörd som sidans filter; dates kommer från date_bounds()"""
+        # Returnerar (dokumentnummer, antal per typ, antal per kryssruta om den
+        # valdes givet övriga filter, antal per månad i tidslinjen utan datumfiltret)
+        scores = None
+        # Med fulltextindex matchar sökorden hela ord även i dokumentsidorna,
+        # och träffarna sorteras efter BM25-poäng i stället för datum
+        if self.full_text and query_words:
+            scores = self.full_text.search(query_words)
+            matches = _bitset(scores, len(self.documents))
+        else:
+            matches = self.search(query_words)
+        without_dates = self._filter(types, departments, categories, matches)
+        result = without_dates & self._date_bits(dates) if dates else without_dates
+        type_counts = [(result & bits).bit_count() if t in types else 0 for t, bits in self.types.items()]
+        
+        without_types = self._filter(range(len(DOCUMENT_TYPES)), departments, categories, matches, dates)
+        without_departments = self._filter(types, (), categories, matches, dates)
+        without_categories = self._filter(types, departments, (), matches, dates)
+        facet_counts = {
+            'types': [(without_types & bits).bit_count() for bits in self.types.values()],
+            'senders': {code: (without_departments & bits).bit_count() for code, bits in self.senders.items()},
+            'categories': {code: (without_categories & bits).bit_count() for code, bits in self.categories.items()}
+        }
+        positions = _bit_positions(result)
+        if scores:
+            positions.sort(key=lambda position: -scores[position])
+        return positions, type_counts, facet_counts, self.histogram(without_dates)
+
+class QueryServer:
+    """Asynkron HTTP-server för frågor mot ett QueryIndex och de byggda filerna under root"""
+    
+    def __init__(self, index, root='.', cache_size=QUERY_CACHE_SIZE):
+        self.index = index
+        self.root = os.path.realpath(root)
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        # Frågor, filer och exporter tas fram i en egen tråd så att händelseloopen kan
+        # betjäna andra anslutningar under tiden; en enda tråd gör att cachen och
+        # indexet aldrig används samtidigt
+        self._executor = ThreadPoolExecutor(max_workers=1)
+    
+    async def run(self, host=SERVE_HOST, port=SERVE_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+    
+    async def handle(self, reader, writer):
+        """Svara på en anslutnings anrop i tur och ordning (keep-alive)"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get('content-length', '').isdigit():
+                    await reader.readexactly(int(headers['content-length']))
+                
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                status, response_headers, body = await loop.run_in_executor(
+                    self._executor, self.respond, method, target, headers)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                
+                # En ström av delar skickas chunked; HTTP/1.0 får den hopslagen
+                if not isinstance(body, bytes) and version != 'HTTP/1.1':
+                    body = await loop.run_in_executor(self._executor, b''.join, body)
+                if isinstance(body, bytes):
+                    response_headers['Content-Length'] = str(len(body))
+                else:
+                    response_headers['Transfer-Encoding'] = 'chunked'
+                response_headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+                head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                head += ''.join(f"{name}: {value}\r\n" for name, value in response_headers.items())
+                writer.write(head.encode('latin-1') + b'\r\n')
+                if method == 'HEAD' or status == 304:
+                    pass
+                elif isinstance(body, bytes):
+                    writer.write(body)
+                else:
+                    while True:
+                        chunk = await loop.run_in_executor(self._executor, next, body, None)
+                        if chunk is None:
+                            break
+                        writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                        await writer.drain()
+                    writer.write(b'0\r\n\r\n')
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    def respond(self, method, target, headers):
+        """Returnera (status, headers, body) för ett anrop; body är bytes eller en ström av bytes-delar"""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        url = urlsplit(target)
+        if url.path.startswith('/api/'):
+            try:
+                return self.respond_api(url.path, parse_qs(url.query, keep_blank_values=True), headers)
+            except ValueError as e:
+                return 400, {'Content-Type': 'text/plain; charset=utf-8'}, str(e).encode('utf-8')
+        return self.respond_file(unquote(url.path), headers)
+    
+    # /api/info beskriver indexet, /api/query ger antal och en sida av träffarna som
+    # kolumner (samma format som sidans datafiler) och /api/export alla träffar som
+    # CSV eller JSONL (format=csv|jsonl) i delar. Filtren är q (sökterm, i fulltext
+    # med BM25-rankning om sidorna crawlats), type (index i DOCUMENT_TYPES), dept och
+    # cat med kommatecken mellan flera värden samt from och to (se date_bounds()).
+    # Svarens ETag är indexets version plus frågan, så en upprepad fråga får 304;
+    # de senaste cache_size frågeresultaten hålls i minnet.
+    def respond_api(self, path, params, headers):
+        def param(name, default=None):
+            return params[name][-1] if name in params else default
+        
+        if path == '/api/info':
+            key = ()
+        elif path in ('/api/query', '/api/export'):
+            type_count = len(DOCUMENT_TYPES)
+            types = param('type')
+            types = tuple(range(type_count)) if types is None else tuple(sorted({int(t) for t in _code_list(types)}))
+            if any(not 0 <= t < type_count for t in types):
+                raise ValueError(f"type måste vara 0-{type_count - 1}")
+            query = (tuple(sorted(set(_WORD.findall(fold(param('q', '')))))),
+                     types, _code_list(param('dept', '')), _code_list(param('cat', '')),
+                     date_bounds(param('from'), param('to')))
+            offset = int(param('offset', 0))
+            limit = min(int(param('limit', QUERY_PAGE_SIZE)), QUERY_MAX_PAGE_SIZE)
+            if offset < 0 or limit < 0:
+                raise ValueError("offset och limit får inte vara negativa")
+            export_format = param('format', 'csv')
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError(f"format måste vara {' eller '.join(EXPORT_FORMATS)}")
+            key = (query, offset, limit) if path == '/api/query' else (query, export_format)
+        else:
+            return 404, {'Content-Type': 'text/plain; charset=utf-8'}, b'Not Found'
+        
+        # Svaret bestäms helt av indexets version och den normaliserade frågan
+        etag = '"' + hashlib.sha1(f"{self.index.version}|{path}|{key!r}".encode('utf-8')).hexdigest() + '"'
+        response_headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if etag in headers.get('if-none-match', ''):
+            return 304, response_headers, b''
+        
+        if path == '/api/info':
+            body = json.dumps({
+                'version': self.index.version,
+                'total': len(self.index.documents),
+                'types': DOCUMENT_TYPES,
+                'fullText': self.index.full_text is not None,
+                'pageSize': QUERY_PAGE_SIZE,
+                'maxPageSize': QUERY_MAX_PAGE_SIZE
+            }, ensure_ascii=False).encode('utf-8')
+            response_headers['Content-Type'] = 'application/json'
+        elif path == '/api/query':
+            positions, type_counts, facet_counts, histogram = self.query(query)
+            body = json.dumps({
+                'total': len(positions),
+                'offset': offset,
+                'typeCounts': type_counts,
+                'facetCounts': facet_counts,
+                'histogram': histogram,
+                'documents': _shard_columns(self.index.documents[position]
+                                            for position in positions[offset:offset + limit])
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            response_headers['Content-Type'] = 'application/json'
+        else:
+            positions = self.query(query)[0]
+            body = export_chunks(export_lines(map(self.index.documents.__getitem__, positions),
+                                              self.index.codes, export_format))
+            response_headers['Content-Type'] = EXPORT_FORMATS[export_format]
+            response_headers['Content-Disposition'] = \
+                f'attachment; filename="{EXPORT_NAME}_{datetime.now():%Y-%m-%d}.{export_format}"'
+        
+        if 'gzip' in headers.get('accept-encoding', ''):
+            if not isinstance(body, bytes):
+                body = _compressed(body, *_gzip_stream(5))
+                response_headers['Content-Encoding'] = 'gzip'
+            elif len(body) > 1024:
+                body = gzip.compress(body, compresslevel=5)
+                response_headers['Content-Encoding'] = 'gzip'
+        return 200, response_headers, body
+    
+    def query(self, query):
+        """Frågeresultat från cachen eller nyberäknat"""
+        result = self._results.get(query)
+        if result is None:
+            result = self.index.query(*query)
+            if self.cache_size > 0:
+                self._results[query] = result
+                if len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(query)
+        return result
+    
+    def respond_file(self, path, headers):
+        """Skicka en byggd fil, förkomprimerad om klienten klarar det"""
+        if path.endswith('/'):
+            path += OUTPUT_FILE
+        file_path = os.path.realpath(os.path.join(self.root, path.lstrip('/')))
+        extension = os.path.splitext(file_path)[1]
+        relative = os.path.relpath(file_path, self.root).split(os.sep)
+        if (relative != [OUTPUT_FILE] and (len(relative) < 2 or relative[0] not in SERVED_DIRS)
+                or extension not in CONTENT_TYPES or not os.path.isfile(file_path)):
+            return 404, {'Content-Type': 'text/plain; charset=utf-8'}, b'Not Found'
+        
+        response_headers = {'Content-Type': CONTENT_TYPES[extension], 'Vary': 'Accept-Encoding'}
+        # Innehållshashade filer ändras aldrig; övriga måste kontrolleras mot ETag
+        if _STATIC_FILE.match(os.path.basename(file_path)):
+            response_headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response_headers['Cache-Control'] = 'no-cache'
+        accepted = headers.get('accept-encoding', '')
+        for suffix, encoding in (('.br', 'br'), ('.gz', 'gzip')):
+            if encoding in accepted and os.path.isfile(file_path + suffix):
+                file_path += suffix
+                response_headers['Content-Encoding'] = encoding
+                break
+        
+        stat = os.stat(file_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        response_headers['ETag'] = etag
+        if etag in headers.get('if-none-match', ''):
+            return 304, response_headers, b''
+        if stat.st_size > CHUNK_SIZE:
+            return 200, response_headers, _file_chunks(file_path)
+        with open(file_path, 'rb') as f:
+            return 200, response_headers, f.read()
+
+def _file_chunks(path):
+    """Filens innehåll i delar om CHUNK_SIZE bytes; filen öppnas först när delarna läses"""
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, cache_size=QUERY_CACHE_SIZE):
+    """Starta frågeservern över lagret och de byggda filerna; körs tills den avbryts"""
+    # Lagret synkas först om det är äldre än STORE_MAX_AGE och läses sedan in i minnet en gång
+    conn, _, _ = update_store()
+    with closing(conn):
+        index = QueryIndex.build(conn)
+    server = QueryServer(index, cache_size=cache_size)
+    print(f"Frågeserver för {len(index.documents)} dokument på http://{host}:{port}/")
+    try:
+        asyncio.run(server.run(host, port))
+    except KeyboardInterrupt:
+        pass
 
 # Exempel på användning
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Skapa dashboard för regeringsdokument från g0v.se")
+    parser.add_argument('command', nargs='?', choices=['build', 'serve', 'alerts', 'crawl'], default='build',
+                        help="build skapar dashboarden (standard), serve startar frågeservern, "
+                             "alerts kör sparade sökningar mot nya dokument, "
+                             "crawl hämtar dokumentsidorna för fulltextsökning")
+    parser.add_argument('--force', action='store_true',
+                        help="bygg om även om inget har ändrats sedan förra bygget "
+                             "(alerts: synka lagret först, crawl: hämta om alla sidor)")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"profilera bygget med cProfile och spara resultatet i {PROFILE_FILE}")
+    parser.add_argument('--host', default=SERVE_HOST, help="adress för serve")
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help="port för serve")
+    parser.add_argument('--cache-size', type=int, default=QUERY_CACHE_SIZE,
+                        help="antal frågeresultat som serve håller i minnet (0 = ingen cache)")
+    parser.add_argument('--queries', default='sparade_sokningar.json',
+                        help="JSON-lista med sparade sökningar för alerts "
+                             "(name, term, doc_types, departments, categories)")
+    parser.add_argument('--output', help="skriv träffarna från alerts som JSON till denna fil")
+    parser.add_argument('--workers', type=int, default=CRAWL_WORKERS, help="antal samtidiga anrop för crawl")
+    parser.add_argument('--limit', type=int, help="hämta högst så här många sidor med crawl")
+    args = parser.parse_args()
+    
+    if args.command == 'serve':
+        serve(args.host, args.port, args.cache_size)
+    elif args.command == 'crawl':
+        conn, _, _ = update_store()
+        with closing(conn):
+            crawl = crawl_pages(conn, args.workers, recrawl=args.force, limit=args.limit)
+        print(f"Dokumentsidor: {crawl.fetched} hämtade, {crawl.not_modified} oförändrade, "
+              f"{crawl.failed} misslyckade ({crawl.seconds:.1f} s)")
+    elif args.command == 'alerts':
+        with open(args.queries, encoding='utf-8') as f:
+            saved_queries = json.load(f)
+        alerts = evaluate_standing_queries(saved_queries, refresh=args.force)
+        for name, docs in alerts.items():
+            print(f"{name}: {len(docs)} nya dokument")
+            for doc in docs:
+                print(f"  - {doc.get('title') or 'Ingen titel'} ({doc.get('id') or ''})")
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(alerts, f, ensure_ascii=False, indent=2)
     # Skapa komplett dashboard
-    create_complete_dashboard()
+    elif args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(create_complete_dashboard, force=args.force)
+        profiler.dump_stats(PROFILE_FILE)
+    else:
+        create_complete_dashboard(force=args.force)
@@ -0,0 +1,39 @@
+import hashlib
+import json
+import os
+import sys
+from contextlib import closing
+
+import pytest
+
+# Testerna importerar create_dashboard direkt från repots rot
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from create_dashboard import CachedResponse, open_store, sync_store  # noqa: E402
+
+CODES = {'1': 'Finansdepartementet', '2': 'Utbildningsdepartementet', '10': 'Skatter', '11': 'Skola'}
+
+
+def _cached(path, value):
+    path.write_text(json.dumps(value, ensure_ascii=False), encoding='utf-8')
+    return CachedResponse(str(path), hashlib.sha256(path.read_bytes()).hexdigest(), False, 0, 0, False)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / 'store.db')
+
+
+@pytest.fixture
+def conn(db_file):
+    with closing(open_store(db_file)) as conn:
+        yield conn
+
+
+@pytest.fixture
+def sync(tmp_path):
+    """sync(conn, dokument) synkar dokumenten som ett hämtat flöde och returnerar sync_store():s statistik"""
+    def sync(conn, documents, doc_type='SOU', codes=CODES):
+        return sync_store(conn, _cached(tmp_path / 'codes.json', codes),
+                          {doc_type: _cached(tmp_path / 'feed.json', documents)})
+    return sync
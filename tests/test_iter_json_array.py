@@ -0,0 +1,44 @@
+import io
+import json
+import random
+
+import pytest
+
+from create_dashboard import iter_json_array
+
+
+def parse(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8, 64])
+def test_objects(chunk_size):
+    documents = [{'id': f'SOU 2024:{i}', 'title': 'Titel, med "citat" och ]', 'senders': [i, '12']}
+                 for i in range(20)]
+    assert parse(json.dumps(documents, ensure_ascii=False), chunk_size) == documents
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7])
+def test_scalars_split_at_chunk_boundary(chunk_size):
+    values = [1.5, -2e-3, 10, 1e10, 0.25, True, False, None, 'a,b', -0.0, 123456789]
+    assert parse(json.dumps(values), chunk_size) == values
+
+
+def test_random_scalars_and_whitespace():
+    rng = random.Random(0)
+    for _ in range(500):
+        values = [rng.choice([rng.randint(-10**6, 10**6), round(rng.uniform(-1e3, 1e3), 3), 'x', None, [1.5], {}])
+                  for _ in range(rng.randint(0, 8))]
+        text = json.dumps(values, separators=(rng.choice([',', ' , ', ',\n']), ':'))
+        assert parse(text, rng.randint(1, 5)) == values
+
+
+@pytest.mark.parametrize('text', ['[]', ' [ ] ', '\n[\n]\n'])
+def test_empty(text):
+    assert parse(text, 1) == []
+
+
+@pytest.mark.parametrize('text', ['{}', '', '[1 2]', '[1,', '[{"a": 1}', '[1.]'])
+def test_invalid(text):
+    with pytest.raises(ValueError):
+        parse(text, 2)
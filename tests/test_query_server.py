@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import create_dashboard
+from create_dashboard import QueryIndex, QueryServer
+
+DOCUMENTS = [
+    {'id': 'SOU 2024:1', 'title': 'Skatt på arbete', 'published': '2024-03-01', 'senders': [1], 'categories': [10]},
+    {'id': 'SOU 2024:2', 'title': 'Skatt på kapital', 'published': '2024-05-01', 'senders': [2], 'categories': [10]},
+    {'id': 'SOU 2023:9', 'title': 'Skolans styrning', 'published': '2023-11-01', 'senders': [2], 'categories': [11]}
+]
+
+
+@pytest.fixture
+def server(conn, sync, tmp_path, monkeypatch):
+    monkeypatch.setattr(create_dashboard, 'SNAPSHOT_FILE', str(tmp_path / 'corpus.snapshot'))
+    monkeypatch.setattr(create_dashboard, '_snapshot', None)
+    (tmp_path / 'index.html').write_text('<!DOCTYPE html>')
+    (tmp_path / 'create_dashboard.py').write_text('')
+    sync(conn, DOCUMENTS)
+    index = QueryIndex.build(conn)
+    return QueryServer(index, root=str(tmp_path))
+
+
+def get(server, target, headers=None):
+    status, response_headers, body = server.respond('GET', target, headers or {})
+    return status, response_headers, body if isinstance(body, bytes) else b''.join(body)
+
+
+def query(server, target):
+    status, _, body = get(server, target)
+    assert status == 200
+    return json.loads(body)
+
+
+def test_query_filters_and_counts(server):
+    result = query(server, '/api/query?q=skatt')
+    assert result['total'] == 2
+    assert result['documents']['id'] == ['SOU 2024:2', 'SOU 2024:1']
+
+    result = query(server, '/api/query?q=skatt&dept=2')
+    assert result['documents']['id'] == ['SOU 2024:2']
+    # Antalet per avsändare räknas utan avsändarfiltret
+    assert result['facetCounts']['senders'] == {'1': 1, '2': 1}
+
+    assert query(server, '/api/query?from=2024&to=2024-04')['documents']['id'] == ['SOU 2024:1']
+    assert query(server, '/api/query?cat=11')['documents']['id'] == ['SOU 2023:9']
+    result = query(server, '/api/query?cat=10&limit=1&offset=1')
+    assert result['total'] == 2 and result['documents']['id'] == ['SOU 2024:1']
+
+
+def test_repeated_query_is_not_modified(server):
+    status, headers, _ = get(server, '/api/query?q=skatt')
+    assert status == 200
+    assert get(server, '/api/query?q=skatt', {'if-none-match': headers['ETag']})[0] == 304
+
+
+def test_export_contains_all_matches(server):
+    status, headers, body = get(server, '/api/export?q=skatt&format=jsonl')
+    assert status == 200 and headers['Content-Type'] == create_dashboard.EXPORT_FORMATS['jsonl']
+    assert [json.loads(line)['id'] for line in body.decode('utf-8').splitlines()] == ['SOU 2024:2', 'SOU 2024:1']
+
+
+@pytest.mark.parametrize('target, status', [
+    ('/api/query?type=9', 400),
+    ('/api/query?limit=-1', 400),
+    ('/api/export?format=xml', 400),
+    ('/api/unknown', 404),
+    ('/', 200),
+    ('/create_dashboard.py', 404),
+    ('/../store.db', 404)
+])
+def test_status(server, target, status):
+    assert get(server, target)[0] == status
+
+
+def test_large_files_are_streamed(server, tmp_path):
+    content = bytes(range(256)) * (create_dashboard.CHUNK_SIZE // 128)
+    (tmp_path / 'export').mkdir()
+    (tmp_path / 'export' / 'regeringsdokument.csv.gz').write_bytes(content)
+    status, headers, body = server.respond('GET', '/export/regeringsdokument.csv.gz', {})
+    assert status == 200 and headers['Content-Type'] == 'application/gzip'
+    assert not isinstance(body, bytes) and b''.join(body) == content
@@ -0,0 +1,95 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from operator import attrgetter
+
+import pytest
+
+from create_dashboard import (
+    FEEDS, CorpusSnapshot, Document, FullTextIndex, date_bounds, load_code_table, open_store, store_version
+)
+
+WORDS = ['skatt', 'skola', 'klimat', 'vård', 'försvar', 'bostad', 'å', 'skattebas']
+FIELDS = attrgetter(*Document.__slots__)
+
+
+@pytest.fixture
+def store(conn, sync):
+    rng = random.Random(1)
+    for doc_type in ('SOU', 'Rapport'):
+        sync(conn, [{
+            'id': f'{doc_type} 2024:{number}',
+            'title': ' '.join(rng.sample(WORDS, 3)),
+            'summary': rng.choice(WORDS) + ', ' + rng.choice(WORDS),
+            'published': f'20{rng.randint(20, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'url': f'/{doc_type.lower()}/{number}',
+            'senders': rng.sample([1, 2], rng.randint(0, 2)),
+            'categories': rng.sample([10, 11], rng.randint(0, 2))
+        } for number in range(60)], doc_type=doc_type)
+    return conn
+
+
+def stored_documents(conn):
+    codes = load_code_table(conn)
+    return [Document.from_json(data, codes) for doc_type, _ in FEEDS for (data,) in conn.execute(
+        'SELECT data FROM documents WHERE document_type = ? ORDER BY rowid', (doc_type,))]
+
+
+def written(conn, path):
+    CorpusSnapshot.write(conn, path, store_version(conn))
+    return CorpusSnapshot.open(path)
+
+
+def test_documents_round_trip(store, tmp_path):
+    snapshot = written(store, str(tmp_path / 'corpus.snapshot'))
+    assert snapshot.version == store_version(store)
+    assert [FIELDS(doc) for doc in snapshot.iter_documents()] == list(map(FIELDS, stored_documents(store)))
+
+
+@pytest.mark.parametrize('term, doc_types, departments, categories, dates', [
+    ('skatt', None, None, None, None),
+    ('skatt vård', None, None, None, None),
+    ('kola', ['SOU'], None, None, None),
+    ('', ['Rapport'], ['finans'], None, None),
+    ('', None, None, ['skola'], ('2022', '2023-06')),
+    ('saknas', None, None, None, None)
+])
+def test_search_matches_store(store, tmp_path, term, doc_types, departments, categories, dates):
+    snapshot = written(store, str(tmp_path / 'corpus.snapshot'))
+    documents = stored_documents(store)
+    codes = snapshot.codes
+    senders = codes.matching(departments) if departments else None
+    wanted_categories = codes.matching(categories) if categories else None
+    date_from, date_to = date_bounds(*dates) if dates else (0, 99999999)
+    expected = [doc.id for doc in documents
+                if all(word in doc.text().lower() for word in term.split())
+                and (not doc_types or FEEDS[doc.type_index][0] in doc_types)
+                and (senders is None or not senders.isdisjoint(doc.senders))
+                and (wanted_categories is None or not wanted_categories.isdisjoint(doc.categories))
+                and date_from <= doc.published <= date_to]
+
+    positions, _ = snapshot.search(term, doc_types, departments, categories, date_bounds(*dates) if dates else None)
+    assert [doc['id'] for doc in snapshot.iter_rows(store, positions)] == expected
+
+
+def test_concurrent_writers(store, db_file, tmp_path):
+    path = str(tmp_path / 'corpus.snapshot')
+
+    def write(_):
+        with closing(open_store(db_file)) as conn:
+            CorpusSnapshot.write(conn, path, store_version(conn))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write, range(8)))
+    assert CorpusSnapshot.open(path).count == 120
+    assert sorted(file.name for file in tmp_path.iterdir() if file.name.startswith('corpus')) == ['corpus.snapshot']
+
+
+def test_fulltext_index_round_trip(store, tmp_path):
+    path = str(tmp_path / 'fulltext.index')
+    built = FullTextIndex.build(store, 'v1')
+    built.save(path)
+    loaded = FullTextIndex.load(path)
+    assert loaded.version == 'v1' and list(loaded.rowids) == list(built.rowids)
+    for query in (['skatt'], ['skola', 'vård'], ['å'], ['saknas'], []):
+        assert loaded.search(query) == pytest.approx(built.search(query))
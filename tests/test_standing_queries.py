@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import create_dashboard
+from create_dashboard import evaluate_standing_queries, open_store
+
+QUERIES = [{'name': 'skatt', 'term': 'skatt'}, {'name': 'alla', 'term': ''}]
+
+
+@pytest.fixture
+def store(conn, sync, db_file, tmp_path, monkeypatch):
+    state_file = str(tmp_path / 'alerts.json')
+
+    def store(documents):
+        sync(conn, documents)
+
+    def evaluate():
+        matches = evaluate_standing_queries(QUERIES, state_file=state_file)
+        return {name: [doc['id'] for doc in docs] for name, docs in matches.items()}
+
+    monkeypatch.setattr(create_dashboard, 'update_store', lambda force=False: (open_store(db_file), None, None))
+    store.evaluate = evaluate
+    store.state_file = state_file
+    return store
+
+
+def doc(number, title='Utredning'):
+    return {'id': f'SOU 2024:{number}', 'title': title, 'published': '2024-01-01'}
+
+
+def test_only_new_documents_are_matched(store):
+    store([doc(1, 'Skatt på arbete'), doc(2)])
+    assert store.evaluate() == {'skatt': ['SOU 2024:1'], 'alla': ['SOU 2024:1', 'SOU 2024:2']}
+    assert store.evaluate() == {'skatt': [], 'alla': []}
+
+    # Samma sekund som förra synken räcker inte för att missa dokumentet
+    store([doc(1, 'Skatt på arbete'), doc(2), doc(3, 'Skatt på kapital')])
+    assert store.evaluate() == {'skatt': ['SOU 2024:3'], 'alla': ['SOU 2024:3']}
+
+
+def test_removed_latest_document_does_not_hide_the_next(store):
+    store([doc(1), doc(2)])
+    store.evaluate()
+    store([doc(1)])
+    store([doc(1), doc(3)])
+    assert store.evaluate()['alla'] == ['SOU 2024:3']
+
+
+def test_timestamp_state_is_carried_over(store, conn):
+    store([doc(1), doc(2)])
+    conn.execute("UPDATE documents SET first_seen = '2024-01-01T00:00:00'")
+    conn.commit()
+    with open(store.state_file, 'w', encoding='utf-8') as f:
+        json.dump({'first_seen': '2024-01-01T00:00:00'}, f)
+    store([doc(1), doc(2), doc(3)])
+    assert store.evaluate()['alla'] == ['SOU 2024:3']
@@ -0,0 +1,55 @@
+import json
+
+import create_dashboard
+
+
+def stored(conn):
+    return {key: json.loads(data) for key, data in conn.execute('SELECT id, data FROM documents ORDER BY rowid')}
+
+
+def test_new_changed_and_removed(conn, sync):
+    first = [{'id': 'SOU 2024:1', 'title': 'A'}, {'id': 'SOU 2024:2', 'title': 'B'}]
+    assert sync(conn, first)['SOU'][:3] == (2, 0, 0)
+
+    second = [{'id': 'SOU 2024:1', 'title': 'A2'}, {'id': 'SOU 2024:3', 'title': 'C'}]
+    assert sync(conn, second)['SOU'][:3] == (1, 1, 1)
+    assert {key: doc['title'] for key, doc in stored(conn).items()} == {'SOU 2024:1': 'A2', 'SOU 2024:3': 'C'}
+
+
+def test_unchanged_feed_is_skipped(conn, sync):
+    documents = [{'id': 'SOU 2024:1', 'title': 'A'}]
+    sync(conn, documents)
+    assert sync(conn, documents) == {}
+
+
+def test_documents_without_id_or_url_are_kept_apart(conn, sync):
+    documents = [
+        {'title': 'Utan id', 'published': '2024-01-01'},
+        {'title': 'Utan id', 'published': '2024-02-01'},
+        {'title': 'Annan titel', 'published': '2024-01-01'},
+        {'title': 'Utan id', 'published': '2024-01-01'},
+        {'url': '/sou/1', 'title': 'Bara url'}
+    ]
+    assert sync(conn, documents)['SOU'].new == 4
+    keys = list(stored(conn))
+    assert '' not in keys and '/sou/1' in keys
+
+    # Nyckeln beror bara på innehållet, så dokumenten känns igen vid nästa synk
+    assert sync(conn, documents[::-1])['SOU'][:3] == (0, 0, 0)
+    assert list(stored(conn)) == keys
+
+
+def test_last_seen_follows_every_sync(conn, sync, monkeypatch):
+    times = iter(['2024-01-01T00:00:00', '2024-01-02T00:00:00'])
+
+    class FixedDatetime(create_dashboard.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return create_dashboard.datetime.fromisoformat(next(times))
+
+    monkeypatch.setattr(create_dashboard, 'datetime', FixedDatetime)
+    documents = [{'id': 'SOU 2024:1', 'title': 'A'}]
+    sync(conn, documents)
+    assert sync(conn, documents) == {}
+    assert conn.execute('SELECT first_seen, last_seen FROM documents').fetchall() == \
+        [('2024-01-01T00:00:00', '2024-01-02T00:00:00')]
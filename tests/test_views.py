@@ -0,0 +1,29 @@
+from create_dashboard import load_code_table, order_view_shards, plan_views, scan_store
+
+DOCUMENTS = [
+    {'id': 'SOU 2024:1', 'title': 'Skatt på arbete', 'published': '2024-03-01', 'senders': [1], 'categories': [10]},
+    {'id': 'SOU 2023:2', 'title': 'Skolans styrning', 'published': '2023-11-01', 'senders': [2], 'categories': [11]},
+    {'id': 'SOU 2022:3', 'title': 'Utan datum', 'published': None, 'senders': [2], 'categories': []}
+]
+
+
+def fingerprints(conn):
+    codes = load_code_table(conn)
+    return {view.name: digest for view, _, digest in plan_views(scan_store(conn, codes), codes, 'v1')}
+
+
+def test_changed_document_only_changes_its_views(conn, sync):
+    sync(conn, DOCUMENTS)
+    before = fingerprints(conn)
+    sync(conn, [dict(DOCUMENTS[0], title='Skatt på kapital')] + DOCUMENTS[1:])
+    after = fingerprints(conn)
+    assert sorted(name for name in before if before[name] != after[name]) == [
+        'departement-1', 'kategori-10', 'typ-statens-offentliga-utredningar']
+
+
+def test_view_shards_merge_years(conn, sync):
+    sync(conn, DOCUMENTS)
+    documents = [doc for docs in scan_store(conn, load_code_table(conn)).documents_by_year.values() for doc in docs]
+    assert [(key, [doc.id for doc in docs]) for key, docs in order_view_shards(documents)] == [
+        ('2024', ['SOU 2024:1', 'SOU 2023:2', 'SOU 2022:3'])]
+    assert [key for key, _ in order_view_shards(documents, max_documents=2)] == ['2024-1', 'undated-2']